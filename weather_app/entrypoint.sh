@@ -8,9 +8,12 @@ done
 
 echo "PostgreSQL started"
 
-# Default
-python manage.py makemigrations
-python manage.py migrate
-python manage.py collectstatic
+# Default (sidecar services set SKIP_MIGRATIONS=1 and leave this to weather-backend)
+if [ -z "$SKIP_MIGRATIONS" ]; then
+  python manage.py makemigrations
+  python manage.py migrate
+  python manage.py manage_api_log_partitions --convert
+  python manage.py collectstatic
+fi
 
 exec "$@"
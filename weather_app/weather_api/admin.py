@@ -1,7 +1,7 @@
 # weather_api/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, LocationHistory, WeatherCache, APIRequestLog
+from .models import CustomUser, LocationHistory, GeocodeCache, CellForecast, WeatherCache, APIRequestLog
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
@@ -27,10 +27,24 @@ class LocationHistoryAdmin(admin.ModelAdmin):
 
 admin.site.register(LocationHistory, LocationHistoryAdmin)
 
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    model = GeocodeCache
+    list_display = ['city_key', 'city_name', 'latitude', 'longitude', 'created_at']
+    search_fields = ('city_key',)
+
+admin.site.register(GeocodeCache, GeocodeCacheAdmin)
+
 class WeatherCacheAdmin(admin.ModelAdmin):
     model = WeatherCache
-    list_display = ['city_name', 'temperature', 'humidity', 'wind_speed', 'cached_at', 'expiry_time']
+    list_display = ['city_key', 'city_name', 'cell_key', 'temperature', 'humidity', 'wind_speed', 'cached_at', 'expiry_time']
 
 admin.site.register(WeatherCache, WeatherCacheAdmin)
 
+class CellForecastAdmin(admin.ModelAdmin):
+    model = CellForecast
+    list_display = ['cell_key', 'temperature', 'humidity', 'wind_speed', 'cached_at', 'expiry_time']
+    search_fields = ('cell_key',)
+
+admin.site.register(CellForecast, CellForecastAdmin)
+
 admin.site.register(APIRequestLog)
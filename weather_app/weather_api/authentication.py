@@ -0,0 +1,65 @@
+# weather_api/authentication.py
+import hashlib
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from .lru import LRUCache
+
+# Per-worker tier in front of the shared cache. Its TTL is kept short because another worker's
+# invalidation cannot reach it; that TTL is how long a revoked token can still be accepted here.
+_local = LRUCache(settings.AUTH_TOKEN_CACHE_LOCAL_SIZE)
+
+
+def _shared():
+    return caches[settings.AUTH_TOKEN_CACHE_ALIAS]
+
+
+def _cache_key(key):
+    # Never put the raw token into cache keys, which show up in Redis tooling
+    return "auth-token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    """Drop a token from both cache tiers so the next request re-reads it from the database."""
+    cache_key = _cache_key(key)
+    _local.delete(cache_key)
+    _shared().delete(cache_key)
+
+
+def _deferred(model, **values):
+    """A ``model`` instance with only ``values`` loaded; any other field is read from the database on first access."""
+    field_names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(None, field_names, [values[name] for name in field_names])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps the token's user id and is_active flag in the cache.
+
+    Nothing else about the user is cached (no password hash, no profile): request.user has only
+    ``id`` and ``is_active`` loaded and reads other fields from the database when a view needs them.
+    Entries are dropped when the token or its user is saved or deleted (see signals.py), so
+    logout, deactivation and account deletion take effect straight away.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        cached = _local.get(cache_key)
+        if cached is None:
+            cached = _shared().get(cache_key)
+            if cached is None:
+                model = self.get_model()
+                try:
+                    cached = model.objects.values_list('user_id', 'user__is_active').get(key=key)
+                except model.DoesNotExist:
+                    raise AuthenticationFailed('Invalid token.')
+                _shared().set(cache_key, cached, settings.AUTH_TOKEN_CACHE_TTL)
+            _local.set(cache_key, cached, settings.AUTH_TOKEN_CACHE_LOCAL_TTL)
+
+        user_id, is_active = cached
+        if not is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        user = _deferred(get_user_model(), id=user_id, is_active=is_active)
+        return (user, _deferred(self.get_model(), key=key, user_id=user_id))
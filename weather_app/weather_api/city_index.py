@@ -0,0 +1,144 @@
+# weather_api/city_index.py
+"""
+In-memory city name index behind /cities/suggest.
+
+Each worker builds it from the bundled gazetteer (CITY_GAZETTEER_PATH, a ``name,country`` CSV)
+plus every city already resolved into GeocodeCache, and rebuilds it every CITY_INDEX_REFRESH_SECONDS
+so cities resolved by other workers show up. Names that start with the query, or have a word that
+does, come first; if there are too few, names sharing enough trigrams with the query fill in,
+which catches most typos.
+"""
+import bisect
+import csv
+import functools
+import threading
+import time
+import unicodedata
+from collections import Counter
+from django.conf import settings
+from .models import GeocodeCache
+
+# Share of trigrams (Jaccard) a name needs with the query to be offered as a fuzzy match
+MIN_SIMILARITY = 0.3
+
+
+def match_key(name):
+    """Case-, whitespace- and accent-insensitive form of ``name`` ("São  Paulo" -> "sao paulo")."""
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).casefold().split())
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CityIndex:
+    """Prefix and trigram index over ``(name, country)`` pairs; earlier entries rank first on ties."""
+
+    def __init__(self, cities=()):
+        self._cities = []
+        self._keys = []
+        self._ids = {}
+        # (suffix starting at a word boundary, city id), sorted, so "york" finds "New York"
+        self._prefixes = []
+        self._postings = {}
+        self._trigram_counts = []
+        self._lock = threading.Lock()
+        for name, country in cities:
+            self._prefixes += self._add(name, country)
+        self._prefixes.sort()
+
+    def _add(self, name, country):
+        """Index everything but the prefixes, which are returned for the caller to merge in."""
+        key = match_key(name)
+        if not key or key in self._ids:
+            return []
+        city_id = self._ids[key] = len(self._cities)
+        self._cities.append((name, country))
+        self._keys.append(key)
+        trigrams = _trigrams(key)
+        self._trigram_counts.append(len(trigrams))
+        for trigram in trigrams:
+            self._postings.setdefault(trigram, []).append(city_id)
+        return [(key[start:], city_id) for start in range(len(key)) if start == 0 or key[start - 1] == ' ']
+
+    def add(self, name, country=''):
+        """Index one more city in place (no-op if a city with the same key is already known)."""
+        with self._lock:
+            for prefix in self._add(name, country):
+                bisect.insort(self._prefixes, prefix)
+
+    def __len__(self):
+        return len(self._cities)
+
+    def suggest(self, query, limit=10):
+        """Up to ``limit`` ``(name, country)`` pairs for ``query``, best first."""
+        key = match_key(query)
+        if not key:
+            return []
+        with self._lock:
+            ranked = {}
+            start = bisect.bisect_left(self._prefixes, (key, -1))
+            for suffix, city_id in self._prefixes[start:]:
+                if not suffix.startswith(key):
+                    break
+                # Whole-name prefix beats a later word matching
+                rank = (0 if suffix == self._keys[city_id] else 1, city_id)
+                ranked[city_id] = min(ranked.get(city_id, rank), rank)
+            results = [city_id for _, city_id in sorted((rank, city_id) for city_id, rank in ranked.items())][:limit]
+
+            if len(results) < limit and len(key) >= 3:
+                query_trigrams = _trigrams(key)
+                shared = Counter(
+                    city_id for trigram in query_trigrams for city_id in self._postings.get(trigram, ())
+                )
+                fuzzy = []
+                for city_id, count in shared.items():
+                    similarity = count / (len(query_trigrams) + self._trigram_counts[city_id] - count)
+                    if similarity >= MIN_SIMILARITY and city_id not in ranked:
+                        fuzzy.append((-similarity, city_id))
+                results += [city_id for _, city_id in sorted(fuzzy)[:limit - len(results)]]
+            return [self._cities[city_id] for city_id in results]
+
+
+@functools.lru_cache(maxsize=None)
+def _gazetteer(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return tuple((row['name'], row.get('country') or '') for row in csv.DictReader(f))
+
+
+def build_index():
+    """A fresh index of the gazetteer followed by every name already in GeocodeCache."""
+    cities = list(_gazetteer(str(settings.CITY_GAZETTEER_PATH)))
+    cities += [(name, '') for name in GeocodeCache.objects.order_by('id').values_list('city_name', flat=True)]
+    return CityIndex(cities)
+
+
+_index = None
+_built_at = 0.0
+_build_lock = threading.Lock()
+
+
+def get_index():
+    """This worker's index, rebuilt once it is older than CITY_INDEX_REFRESH_SECONDS."""
+    global _index, _built_at
+    index = _index
+    if index is not None and time.monotonic() - _built_at < settings.CITY_INDEX_REFRESH_SECONDS:
+        return index
+    # Requests keep using the old index while one thread rebuilds it; only the very first build waits
+    if not _build_lock.acquire(blocking=index is None):
+        return index
+    try:
+        if _index is index:
+            _index = build_index()
+            _built_at = time.monotonic()
+        return _index
+    finally:
+        _build_lock.release()
+
+
+def remember(city_name):
+    """Make a city that just resolved upstream suggestible in this worker without waiting for a rebuild."""
+    if _index is not None:
+        _index.add(' '.join(city_name.split()))
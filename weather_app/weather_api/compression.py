@@ -0,0 +1,46 @@
+# weather_api/compression.py
+import functools
+import gzip
+import brotli
+
+# Bodies are compressed once when they are cached, so both can afford a better ratio than on-the-fly compression
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 8
+# Same threshold as django.middleware.gzip, below it the headers outweigh the savings
+MIN_BYTES = 200
+# In order of preference when the client accepts several
+ENCODINGS = ('br', 'gzip')
+
+
+def compress(body):
+    """``{content_coding: compressed body}`` for every supported coding, or {} if ``body`` is too small."""
+    if len(body) < MIN_BYTES:
+        return {}
+    return {
+        'br': brotli.compress(body, quality=BROTLI_QUALITY),
+        'gzip': gzip.compress(body, GZIP_LEVEL, mtime=0),
+    }
+
+
+@functools.lru_cache(maxsize=64)
+def _accepted(accept_encoding):
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return tuple(coding for coding in ENCODINGS if qualities.get(coding, qualities.get('*', 0)) > 0)
+
+
+def negotiate(accept_encoding, available):
+    """The preferred coding in ``available`` allowed by an Accept-Encoding header, or None for identity."""
+    for coding in _accepted(accept_encoding):
+        if coding in available:
+            return coding
+    return None
@@ -0,0 +1,37 @@
+# weather_api/exports.py
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line straight back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows, fields):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
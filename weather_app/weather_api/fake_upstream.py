@@ -0,0 +1,96 @@
+# weather_api/fake_upstream.py
+import hashlib
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FORECAST_HOURS = 168
+
+
+def city_coordinates(city_name):
+    """Stable made-up coordinates for any city name, so every name geocodes."""
+    digest = hashlib.sha256(' '.join(city_name.split()).casefold().encode()).digest()
+    lat = int.from_bytes(digest[:4], 'big') / 2**32 * 140 - 70
+    lon = int.from_bytes(digest[4:8], 'big') / 2**32 * 360 - 180
+    return round(lat, 4), round(lon, 4)
+
+
+def geocode_response(city_name):
+    lat, lon = city_coordinates(city_name)
+    return [{'name': city_name, 'lat': lat, 'lon': lon, 'country': 'XX'}]
+
+
+def forecast_response(lat, lon, variables):
+    """An Open-Meteo shaped forecast with FORECAST_HOURS hourly rows of every requested variable."""
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    seed = random.Random(f"{lat},{lon}")
+    hourly = {'time': [(start + timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M') for i in range(FORECAST_HOURS)]}
+    for variable in variables:
+        base = seed.uniform(0, 30)
+        hourly[variable] = [round(base + seed.uniform(-3, 3), 1) for _ in range(FORECAST_HOURS)]
+    return {
+        'latitude': lat,
+        'longitude': lon,
+        'current': {variable: values[0] for variable, values in hourly.items() if variable != 'time'},
+        'hourly': hourly,
+    }
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    server_version = "FakeUpstream/1.0"
+
+    def do_GET(self):
+        # Set on the server by make_server()
+        options = self.server.options
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        delay = max(0.0, random.gauss(options['latency_ms'], options['jitter_ms'])) / 1000
+        roll = random.random()
+        if roll < options['hang_rate']:
+            delay = options['hang_seconds']
+        time.sleep(delay)
+        if options['hang_rate'] <= roll < options['hang_rate'] + options['failure_rate']:
+            return self._send(500, {'error': True, 'reason': 'Injected failure'})
+
+        if url.path.endswith('/geo/1.0/direct'):
+            return self._send(200, geocode_response(query.get('q', '')))
+        if url.path.endswith('/v1/forecast'):
+            variables = query.get('hourly', 'temperature_2m').split(',')
+            coordinates = list(zip(query.get('latitude', '0').split(','), query.get('longitude', '0').split(',')))
+            forecasts = [forecast_response(float(lat), float(lon), variables) for lat, lon in coordinates]
+            return self._send(200, forecasts[0] if len(forecasts) == 1 else forecasts)
+        return self._send(404, {'error': True, 'reason': 'Not found'})
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=8900, latency_ms=50.0, jitter_ms=10.0, failure_rate=0.0, hang_rate=0.0, hang_seconds=30.0):
+    """
+    Build a local stand-in for the OpenWeatherMap geocoding and Open-Meteo forecast APIs.
+
+    Every response waits about ``latency_ms``. A ``failure_rate`` share of requests answer 500,
+    and a ``hang_rate`` share stall for ``hang_seconds`` to trip the client timeouts.
+    """
+    server = ThreadingHTTPServer((host, port), FakeUpstreamHandler)
+    server.daemon_threads = True
+    server.options = {
+        'latency_ms': latency_ms,
+        'jitter_ms': jitter_ms,
+        'failure_rate': failure_rate,
+        'hang_rate': hang_rate,
+        'hang_seconds': hang_seconds,
+    }
+    return server
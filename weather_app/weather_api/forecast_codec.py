@@ -0,0 +1,166 @@
+# weather_api/forecast_codec.py
+"""
+Compact binary encoding for the Open-Meteo ``hourly`` block.
+
+Open-Meteo returns one ISO timestamp string per hour plus a parallel list per variable. Since the
+hours are evenly spaced, we store only the first timestamp and the step, followed by one packed
+little-endian float32 array per variable (missing values become NaN)::
+
+    header   <B version> <q start epoch> <I step seconds> <I hours> <B variables>
+    names    per variable: <B kind> <B name length> <name utf-8>
+    arrays   per variable: hours * float32
+"""
+import datetime
+import struct
+import time
+from collections import namedtuple
+import numpy as np
+from .units import CELSIUS, KMH, convert_variable
+
+VERSION = 1
+TIME_FORMAT = '%Y-%m-%dT%H:%M'
+KIND_FLOAT = 0
+KIND_INT = 1
+
+_HEADER = struct.Struct('<BqIIB')
+_NAME = struct.Struct('<BB')
+_FLOAT32 = np.dtype('<f4')
+
+# Which variables, how many upcoming hours and which units a client asked for; None means everything
+ForecastSelection = namedtuple(
+    'ForecastSelection', ['fields', 'hours', 'temperature_unit', 'wind_speed_unit'], defaults=(CELSIUS, KMH),
+)
+FULL_FORECAST = ForecastSelection(None, None)
+
+
+def _pack(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=_FLOAT32).tobytes()
+
+
+def _to_list(values, kind):
+    """Turn a float column back into JSON-ready values, with NaN as None."""
+    missing = np.isnan(values)
+    if kind == KIND_INT:
+        result = np.rint(np.where(missing, 0, values)).astype(np.int64).tolist()
+    else:
+        # float32 keeps ~7 significant digits; Open-Meteo reports at most 2 decimals
+        result = np.round(values, 2).tolist()
+    for index in np.flatnonzero(missing):
+        result[index] = None
+    return result
+
+
+def _parse_time(value):
+    return datetime.datetime.strptime(value, TIME_FORMAT).replace(tzinfo=datetime.timezone.utc)
+
+
+def encode_hourly(hourly):
+    """Encode an Open-Meteo ``hourly`` dict; raises ValueError if the hours are not evenly spaced."""
+    times = hourly['time']
+    start = _parse_time(times[0]) if times else datetime.datetime.fromtimestamp(0, datetime.timezone.utc)
+    step = int((_parse_time(times[1]) - start).total_seconds()) if len(times) > 1 else 3600
+    if any(_parse_time(value) != start + datetime.timedelta(seconds=step * i) for i, value in enumerate(times)):
+        raise ValueError("hourly timestamps are not evenly spaced")
+
+    variables = [name for name in hourly if name != 'time']
+    parts = [_HEADER.pack(VERSION, int(start.timestamp()), step, len(times), len(variables))]
+    for name in variables:
+        kind = KIND_INT if all(value is None or isinstance(value, int) for value in hourly[name]) else KIND_FLOAT
+        encoded = name.encode()
+        parts.append(_NAME.pack(kind, len(encoded)) + encoded)
+    for name in variables:
+        parts.append(_pack(hourly[name]))
+    return b''.join(parts)
+
+
+def variables(blob):
+    """Names of the variables stored in ``blob``, in storage order."""
+    return [name for name, _ in _read_header(blob)[4]]
+
+
+def _read_header(blob):
+    blob = bytes(blob)
+    version, start, step, hours, count = _HEADER.unpack_from(blob)
+    if version != VERSION:
+        raise ValueError(f"unsupported forecast encoding version {version}")
+    offset = _HEADER.size
+    names = []
+    for _ in range(count):
+        kind, length = _NAME.unpack_from(blob, offset)
+        offset += _NAME.size
+        names.append((blob[offset:offset + length].decode(), kind))
+        offset += length
+    return blob, start, step, hours, names, offset
+
+
+def decode_hourly(blob, selection=FULL_FORECAST, now=None):
+    """
+    Decode ``blob`` back into Open-Meteo's ``hourly`` shape.
+
+    ``selection.fields`` limits the variables returned; ``selection.hours`` returns only that many
+    hours starting with the current one instead of the whole stored range. Temperature and wind
+    columns are converted to ``selection``'s units.
+    """
+    blob, start, step, hours, names, offset = _read_header(blob)
+
+    first, last = 0, hours
+    if selection.hours is not None:
+        now = time.time() if now is None else now
+        first = min(hours, max(0, int((now - start) // step)))
+        last = min(hours, first + selection.hours)
+
+    hourly = {
+        'time': [
+            datetime.datetime.fromtimestamp(start + step * i, datetime.timezone.utc).strftime(TIME_FORMAT)
+            for i in range(first, last)
+        ],
+    }
+    for index, (name, kind) in enumerate(names):
+        if selection.fields is not None and name not in selection.fields:
+            continue
+        values = np.frombuffer(blob, dtype=_FLOAT32, count=last - first, offset=offset + (index * hours + first) * 4)
+        values = values.astype(np.float64)
+        converted = convert_variable(name, values, selection.temperature_unit, selection.wind_speed_unit)
+        if converted is not values:
+            # Converted columns are no longer whole numbers
+            kind = KIND_FLOAT
+        hourly[name] = _to_list(converted, kind)
+    return hourly
+
+
+def parse_selection(query_params, user=None):
+    """
+    Build a ForecastSelection from ``?fields=a,b&hours=N&units=preferred``; raises ValueError on bad input.
+
+    ``units=preferred`` converts to ``user``'s preferred units, the default ``units=metric`` leaves
+    values as Open-Meteo reports them (°C, km/h).
+    """
+    fields = query_params.get('fields')
+    hours = query_params.get('hours')
+    if fields is not None:
+        fields = tuple(sorted({field.strip() for field in fields.split(',') if field.strip()}))
+    if hours is not None:
+        try:
+            hours = int(hours)
+        except ValueError:
+            raise ValueError("hours must be a positive integer")
+        if hours < 1:
+            raise ValueError("hours must be a positive integer")
+    units = query_params.get('units', 'metric')
+    if units == 'preferred' and user is not None:
+        return ForecastSelection(fields, hours, user.preferred_temperature_unit, user.preferred_wind_speed_unit)
+    if units not in ('metric', 'preferred'):
+        raise ValueError("units must be metric or preferred")
+    return ForecastSelection(fields, hours)
+
+
+def selection_key(selection, now=None):
+    """Cache key suffix for a selection; hour-based selections change every step of the clock."""
+    if selection == FULL_FORECAST:
+        return 'full'
+    key = f"fields={','.join(selection.fields) if selection.fields is not None else '*'}"
+    key += f";units={selection.temperature_unit},{selection.wind_speed_unit}"
+    if selection.hours is not None:
+        now = time.time() if now is None else now
+        key += f";hours={selection.hours};at={int(now // 3600)}"
+    return key
@@ -0,0 +1,102 @@
+# weather_api/geocoding.py
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from . import city_index
+from .lru import LRUCache
+from .metrics import span
+from .models import GeocodeCache
+from .upstream import afetch_coordinates, fetch_coordinates
+
+_coordinates = LRUCache(settings.GEOCODE_LRU_SIZE)
+# Names OpenWeatherMap had no result for, so each one reaches it only once per GEOCODE_NEGATIVE_TTL
+_unknown = LRUCache(settings.GEOCODE_LRU_SIZE)
+
+
+def _shared():
+    return caches[settings.GEOCODE_NEGATIVE_CACHE_ALIAS]
+
+
+def _unknown_key(city_key):
+    # These are exactly the names nobody could geocode, so anything can be in them; hash for memcached
+    return "geocode-unknown:" + hashlib.sha256(city_key.encode()).hexdigest()
+
+
+def _remember_unknown(city_key):
+    _unknown.set(city_key, True, settings.GEOCODE_NEGATIVE_TTL)
+    _shared().set(_unknown_key(city_key), True, settings.GEOCODE_NEGATIVE_TTL)
+
+
+def normalize_city_name(city_name):
+    """Fold case and whitespace so "  new   York" and "New York" share one key."""
+    return ' '.join(city_name.split()).casefold()
+
+
+@span('geocode')
+def geocode(city_name):
+    """
+    Return ``(latitude, longitude)`` for ``city_name``, or None if the city is unknown.
+
+    Lookups go through the per-worker LRU, then the GeocodeCache table, and only
+    reach OpenWeatherMap the first time a city is seen. Names it did not know are
+    remembered too, so they are not asked about again.
+    """
+    city_key = normalize_city_name(city_name)
+    coordinates = _coordinates.get(city_key)
+    if coordinates is not None:
+        return coordinates
+    if _unknown.get(city_key):
+        return None
+
+    row = GeocodeCache.objects.filter(city_key=city_key).values_list('latitude', 'longitude').first()
+    if row is None:
+        if _shared().get(_unknown_key(city_key)):
+            # Another worker already learned this name is unknown
+            _unknown.set(city_key, True, settings.GEOCODE_NEGATIVE_TTL)
+            return None
+        coordinates = fetch_coordinates(' '.join(city_name.split()))
+        if coordinates is None:
+            _remember_unknown(city_key)
+            return None
+        GeocodeCache.objects.get_or_create(
+            city_key=city_key,
+            defaults={'city_name': city_name, 'latitude': coordinates[0], 'longitude': coordinates[1]},
+        )
+        city_index.remember(city_name)
+    else:
+        coordinates = tuple(row)
+
+    _coordinates.set(city_key, coordinates)
+    return coordinates
+
+
+async def ageocode(city_name):
+    """Async version of geocode() for the ASGI weather endpoint."""
+    with span('geocode'):
+        city_key = normalize_city_name(city_name)
+        coordinates = _coordinates.get(city_key)
+        if coordinates is not None:
+            return coordinates
+        if _unknown.get(city_key):
+            return None
+
+        row = await GeocodeCache.objects.filter(city_key=city_key).values_list('latitude', 'longitude').afirst()
+        if row is None:
+            if await _shared().aget(_unknown_key(city_key)):
+                _unknown.set(city_key, True, settings.GEOCODE_NEGATIVE_TTL)
+                return None
+            coordinates = await afetch_coordinates(' '.join(city_name.split()))
+            if coordinates is None:
+                _unknown.set(city_key, True, settings.GEOCODE_NEGATIVE_TTL)
+                await _shared().aset(_unknown_key(city_key), True, settings.GEOCODE_NEGATIVE_TTL)
+                return None
+            await GeocodeCache.objects.aget_or_create(
+                city_key=city_key,
+                defaults={'city_name': city_name, 'latitude': coordinates[0], 'longitude': coordinates[1]},
+            )
+            city_index.remember(city_name)
+        else:
+            coordinates = tuple(row)
+
+        _coordinates.set(city_key, coordinates)
+        return coordinates
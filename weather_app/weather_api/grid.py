@@ -0,0 +1,25 @@
+# weather_api/grid.py
+import math
+from django.conf import settings
+
+
+def grid_cell(lat, lon):
+    """
+    Key of the fixed-size lat/lon tile containing ``(lat, lon)``.
+
+    The tile size is part of the key, so changing WEATHER_GRID_DEGREES never mixes rows cut at
+    different resolutions.
+    """
+    step = settings.WEATHER_GRID_DEGREES
+    # The north pole belongs to the top row rather than one of its own
+    row = min(math.floor((lat + 90) / step), math.ceil(180 / step) - 1)
+    col = math.floor(((lon + 180) % 360) / step)
+    return f"{step:g}:{row}:{col}"
+
+
+def cell_center(cell_key):
+    """The ``(lat, lon)`` forecasts for the tile are fetched at, so every city in it gets the same data."""
+    step, row, col = cell_key.split(':')
+    step = float(step)
+    lat = min((int(row) + 0.5) * step - 90, 90)
+    return round(lat, 6), round((int(col) + 0.5) * step - 180, 6)
@@ -0,0 +1,101 @@
+# weather_api/history.py
+"""
+Hourly weather history per grid cell.
+
+Every forecast fetched from Open-Meteo starts at midnight UTC of the current day, so its hours up
+to now are the best available record of what the weather was. Those hours are appended to
+WeatherObservation; later forecasts covering an hour already stored are ignored. Range queries
+load the columns straight into numpy arrays and aggregate per day or week.
+"""
+import datetime
+import numpy as np
+from django.utils import timezone
+from .forecast_codec import TIME_FORMAT
+from .models import WeatherObservation
+from .upstream import HOURLY_VARIABLES
+
+BUCKET_SECONDS = {'day': 24 * 3600, 'week': 7 * 24 * 3600}
+# Weeks start on Monday; the Unix epoch fell on a Thursday
+_BUCKET_OFFSETS = {'day': 0, 'week': 3 * 24 * 3600}
+
+
+def observations(cell_key, weather_response, now=None):
+    """Unsaved WeatherObservation rows for the hours of ``weather_response`` that are already past."""
+    now = now or timezone.now()
+    hourly = weather_response['hourly']
+    rows = []
+    for index, value in enumerate(hourly['time']):
+        observed_at = datetime.datetime.strptime(value, TIME_FORMAT).replace(tzinfo=datetime.timezone.utc)
+        if observed_at > now:
+            break
+        values = {name: hourly[name][index] for name in HOURLY_VARIABLES if name in hourly}
+        rows.append(WeatherObservation(cell_key=cell_key, observed_at=observed_at, **values))
+    return rows
+
+
+def record(weather_responses):
+    """Append the past hours of ``{cell_key: weather_response}``; hours already stored are left alone."""
+    now = timezone.now()
+    rows = [row for cell_key, weather_response in weather_responses.items() for row in observations(cell_key, weather_response, now)]
+    WeatherObservation.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def load(cell_key, start, end, variables):
+    """``(epoch seconds, {variable: float64 array})`` of the hours in ``[start, end)``, oldest first; NULL becomes NaN."""
+    rows = (
+        WeatherObservation.objects.filter(cell_key=cell_key, observed_at__gte=start, observed_at__lt=end)
+        .order_by('observed_at')
+        .values_list('observed_at', *variables)
+    )
+    rows = list(rows)
+    if not rows:
+        return np.empty(0, dtype=np.int64), {name: np.empty(0) for name in variables}
+    times, *columns = zip(*rows)
+    epochs = np.fromiter((value.timestamp() for value in times), dtype=np.int64, count=len(times))
+    return epochs, {name: np.array(column, dtype=np.float64) for name, column in zip(variables, columns)}
+
+
+def aggregate(epochs, columns, bucket, percentiles):
+    """
+    Per-bucket aggregates of ``columns``, one dict per non-empty bucket.
+
+    min/max/mean and the requested percentiles are computed per bucket over the raw arrays,
+    skipping missing (NaN) hours; a variable with no values in a bucket gets None throughout.
+    """
+    if not len(epochs):
+        return []
+    size = BUCKET_SECONDS[bucket]
+    offset = _BUCKET_OFFSETS[bucket]
+    bucket_ids = (epochs + offset) // size
+    # epochs are sorted, so every bucket is one contiguous slice
+    starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+    ends = np.r_[starts[1:], len(epochs)]
+
+    stats = {}
+    for name, values in columns.items():
+        present = ~np.isnan(values)
+        counts = np.add.reduceat(present.astype(np.int64), starts)
+        sums = np.add.reduceat(np.where(present, values, 0), starts)
+        mins = np.fmin.reduceat(values, starts)
+        maxs = np.fmax.reduceat(values, starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        quantiles = np.full((len(starts), len(percentiles)), np.nan)
+        for index, (first, last) in enumerate(zip(starts, ends)):
+            if counts[index] and percentiles:
+                quantiles[index] = np.nanpercentile(values[first:last], percentiles)
+        stats[name] = (mins, maxs, means, quantiles)
+
+    result = []
+    for index, first in enumerate(starts):
+        bucket_start = int(bucket_ids[first]) * size - offset
+        entry = {
+            'start': datetime.datetime.fromtimestamp(bucket_start, datetime.timezone.utc),
+            'hours': int(ends[index] - first),
+        }
+        for name, (mins, maxs, means, quantiles) in stats.items():
+            values = {'min': mins[index], 'max': maxs[index], 'mean': means[index]}
+            values.update((f"p{percentile:g}", quantile) for percentile, quantile in zip(percentiles, quantiles[index]))
+            entry[name] = {key: None if np.isnan(value) else round(float(value), 2) for key, value in values.items()}
+        result.append(entry)
+    return result
@@ -0,0 +1,182 @@
+# weather_api/loadgen.py
+import random
+import secrets
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from .models import APIRequestLog, CustomUser
+
+BENCH_EMAIL_DOMAIN = "bench.invalid"
+
+
+def bench_tokens(count, admin=False):
+    """
+    Return API tokens for ``count`` benchmark users, creating the users on first use.
+
+    The scenarios only ever authenticate with the token, so each user gets a random password
+    nobody knows; delete_bench_users() removes them when the run ends.
+    """
+    prefix = "bench-admin" if admin else "bench-user"
+    tokens = []
+    for i in range(count):
+        email = f"{prefix}-{i}@{BENCH_EMAIL_DOMAIN}"
+        user = CustomUser.objects.filter(email=email).first()
+        if user is None:
+            user = CustomUser.objects.create_user(email, f"{prefix} {i}", secrets.token_urlsafe(32))
+        if admin and not user.is_staff:
+            user.is_staff = True
+            user.save(update_fields=['is_staff'])
+        tokens.append(Token.objects.get_or_create(user=user)[0].key)
+    return tokens
+
+
+def delete_bench_users():
+    """Delete every benchmark user with their tokens and API log rows; returns the number of users deleted."""
+    users = CustomUser.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}")
+    APIRequestLog.objects.filter(user__in=users).delete()
+    # Deleting the users cascades to their tokens, whose post_delete signal drops them from the auth cache
+    return users.delete()[1].get(CustomUser._meta.label, 0)
+
+
+def seed_api_logs(rows, batch_size=5000):
+    """Top up APIRequestLog to at least ``rows`` rows so the admin listing has something to page through."""
+    missing = rows - APIRequestLog.objects.count()
+    if missing <= 0:
+        return 0
+    users = list(CustomUser.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}"))
+    now = timezone.now()
+    for start in range(0, missing, batch_size):
+        # Spread over the last 30 days so the listing pages through a realistic range
+        APIRequestLog.objects.bulk_create([
+            APIRequestLog(
+                user=users[i % len(users)],
+                city_name=f"Bench Mixed {i % 200}",
+                request_url="Cache hit",
+                response_status=200,
+                request_time=now - timezone.timedelta(days=30 * random.random()),
+            )
+            for i in range(start, min(start + batch_size, missing))
+        ])
+    return missing
+
+
+class LoadRunner:
+    """Fire ``(token, path)`` requests at ``base_url`` from ``concurrency`` threads, each with its own keep-alive session."""
+
+    def __init__(self, base_url, concurrency, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def request(self, token, path):
+        started = time.perf_counter()
+        try:
+            response = self._session().get(self.base_url + path, headers={'Authorization': f'Token {token}'}, timeout=self.timeout)
+            outcome = response.status_code
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+        return (time.perf_counter() - started) * 1000, outcome
+
+    def run(self, plan):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            results = list(pool.map(lambda item: self.request(*item), plan))
+        return results, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(scenario, results, elapsed):
+    latencies = sorted(latency for latency, _ in results)
+    outcomes = Counter(outcome for _, outcome in results)
+    return {
+        'scenario': scenario,
+        'requests': len(results),
+        'rps': round(len(results) / elapsed, 1),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'errors': sum(count for outcome, count in outcomes.items() if outcome != 200),
+        'outcomes': {str(outcome): count for outcome, count in sorted(outcomes.items(), key=str)},
+    }
+
+
+# Each scenario builds its request plan against a runner (which it may use for untimed warm-up)
+# and returns a shuffled list of (token, path) pairs.
+
+def hit_heavy(runner, requests_count):
+    """Nearly every request is a response-cache hit on a handful of warm cities."""
+    tokens = bench_tokens(20)
+    cities = [f"Bench Hit {i}" for i in range(10)]
+    for city in cities:
+        runner.request(tokens[0], f"/weather/{city}")
+    return [(random.choice(tokens), f"/weather/{random.choice(cities)}") for _ in range(requests_count)]
+
+
+def miss_storm(runner, requests_count):
+    """Bursts of concurrent requests for cities nobody has asked for yet, about 50 per city."""
+    tokens = bench_tokens(20)
+    run_id = uuid.uuid4().hex[:8]
+    cities = [f"Bench Miss {run_id} {i}" for i in range(max(1, requests_count // 50))]
+    return [(random.choice(tokens), f"/weather/{cities[i % len(cities)]}") for i in range(requests_count)]
+
+
+def mixed_user(runner, requests_count):
+    """Many users looking up a long tail of cities and reading their own search history."""
+    tokens = bench_tokens(50)
+    plan = []
+    for _ in range(requests_count):
+        token = random.choice(tokens)
+        if random.random() < 0.2:
+            plan.append((token, "/search-history/"))
+        else:
+            # Skewed towards a few popular cities, like real traffic
+            plan.append((token, f"/weather/Bench Mixed {min(int(random.expovariate(1 / 20)), 199)}"))
+    return plan
+
+
+def admin_listing(runner, requests_count):
+    """Admins paging through a large API log, filtering it by user, and listing users."""
+    bench_tokens(20)
+    (token,) = bench_tokens(1, admin=True)
+    seed_api_logs(20000)
+
+    cursors = [None]
+    for _ in range(20):
+        response = runner._session().get(
+            runner.base_url + "/admin/api-logs/" + (f"?cursor={cursors[-1]}" if cursors[-1] else ""),
+            headers={'Authorization': f'Token {token}'}, timeout=runner.timeout,
+        )
+        next_cursor = response.json().get('next_cursor')
+        if not next_cursor:
+            break
+        cursors.append(next_cursor)
+
+    paths = [f"/admin/api-logs/?cursor={cursor}" if cursor else "/admin/api-logs/" for cursor in cursors]
+    paths += [f"/admin/api-logs/?user=bench-user-{i}@{BENCH_EMAIL_DOMAIN}" for i in range(20)]
+    paths += ["/admin/users/"]
+    return [(token, random.choice(paths)) for _ in range(requests_count)]
+
+
+SCENARIOS = {
+    'hit-heavy': hit_heavy,
+    'miss-storm': miss_storm,
+    'mixed-user': mixed_user,
+    'admin-listing': admin_listing,
+}
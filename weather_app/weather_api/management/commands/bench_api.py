@@ -0,0 +1,55 @@
+# weather_api/management/commands/bench_api.py
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from weather_api.loadgen import SCENARIOS, LoadRunner, delete_bench_users, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test a running backend and report latency percentiles and throughput per scenario. "
+        "Point the backend at `manage.py fake_upstream` and run this with the same database settings. "
+        "The benchmark users it creates are deleted when the run ends."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000/api')
+        parser.add_argument('--scenario', choices=[*SCENARIOS, 'all'], default='all')
+        parser.add_argument('--requests', type=int, default=1000, help="Requests per scenario.")
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--json', action='store_true', help="Print one JSON object per scenario.")
+        parser.add_argument('--max-p95-ms', type=float, help="Fail if any scenario's p95 exceeds this.")
+        parser.add_argument('--max-error-rate', type=float, help="Fail if any scenario's share of non-200 responses exceeds this.")
+
+    def handle(self, *args, **options):
+        runner = LoadRunner(options['base_url'], options['concurrency'], options['timeout'])
+        names = list(SCENARIOS) if options['scenario'] == 'all' else [options['scenario']]
+
+        failures = []
+        try:
+            for name in names:
+                plan = SCENARIOS[name](runner, options['requests'])
+                summary = summarize(name, *runner.run(plan))
+                if options['json']:
+                    self.stdout.write(json.dumps(summary))
+                else:
+                    self.stdout.write(
+                        f"{name:>14}: {summary['requests']} requests  {summary['rps']} req/s  "
+                        f"p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms p99={summary['p99_ms']}ms  "
+                        f"errors={summary['errors']} {summary['outcomes']}"
+                    )
+
+                if options['max_p95_ms'] is not None and summary['p95_ms'] > options['max_p95_ms']:
+                    failures.append(f"{name} p95 {summary['p95_ms']}ms > {options['max_p95_ms']}ms")
+                if options['max_error_rate'] is not None and summary['errors'] / summary['requests'] > options['max_error_rate']:
+                    failures.append(f"{name} error rate {summary['errors'] / summary['requests']:.3f} > {options['max_error_rate']}")
+        finally:
+            # The backend buffers log rows; one still pending for a deleted user would fail its whole batch
+            time.sleep(settings.API_LOG_FLUSH_SECONDS + 1)
+            deleted = delete_bench_users()
+            self.stdout.write(f"Deleted {deleted} benchmark users")
+
+        if failures:
+            raise CommandError("Benchmark thresholds exceeded: " + "; ".join(failures))
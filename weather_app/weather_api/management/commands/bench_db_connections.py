@@ -0,0 +1,63 @@
+# weather_api/management/commands/bench_db_connections.py
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+from weather_api.models import WeatherCache
+
+
+def run_requests(requests, conn_max_age):
+    """
+    Replay ``requests`` request cycles with ``conn_max_age`` and return ``(latencies_ms, connections_opened)``.
+
+    Each cycle fires the same request_started/request_finished signals Django sends around a real
+    request, which is where it closes or keeps the connection, with one cache lookup in between.
+    """
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    connection.close()
+    saved = connection.settings_dict['CONN_MAX_AGE']
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    connection_created.connect(count)
+    latencies = []
+    try:
+        for _ in range(requests):
+            started = time.perf_counter()
+            request_started.send(sender=__name__)
+            WeatherCache.objects.filter(city_key='bench').exists()
+            request_finished.send(sender=__name__)
+            latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        connection_created.disconnect(count)
+        connection.settings_dict['CONN_MAX_AGE'] = saved
+        connection.close()
+    return latencies, len(opened)
+
+
+class Command(BaseCommand):
+    help = "Compare per-request DB cost with a new connection per request against persistent connections."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--conn-max-age', type=int, default=None, help="Persistent pass setting (default: DB_CONN_MAX_AGE, or 60 if that is 0).")
+
+    def handle(self, *args, **options):
+        persistent = options['conn_max_age']
+        if persistent is None:
+            persistent = connection.settings_dict['CONN_MAX_AGE'] or 60
+
+        self.stdout.write(f"{options['requests']} requests against {connection.vendor} at {connection.settings_dict.get('HOST') or 'local'}")
+        for label, conn_max_age in (("reconnect per request", 0), (f"CONN_MAX_AGE={persistent}", persistent)):
+            latencies, opened = run_requests(options['requests'], conn_max_age)
+            latencies.sort()
+            self.stdout.write(
+                f"{label:>24}: connections opened={opened} "
+                f"mean={statistics.fmean(latencies):.2f}ms "
+                f"p50={latencies[len(latencies) // 2]:.2f}ms "
+                f"p95={latencies[int(len(latencies) * 0.95)]:.2f}ms"
+            )
@@ -0,0 +1,59 @@
+# weather_api/management/commands/bench_rendering.py
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from weather_api.compression import compress
+from weather_api.fake_upstream import city_coordinates, forecast_response
+from weather_api.forecast_codec import FULL_FORECAST
+from weather_api.renderers import dumps
+from weather_api.serializers import WeatherCacheSerializer
+from weather_api.upstream import HOURLY_VARIABLES
+from weather_api.weather_store import weather_row
+
+
+def time_ms(func, iterations):
+    """Per-call latencies of ``func`` in milliseconds, sorted."""
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return latencies
+
+
+class Command(BaseCommand):
+    help = "Compare JSON rendering and response compression costs for a full get_weather forecast body."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # An unsaved row shaped exactly like the ones get_weather serializes, no database needed
+        lat, lon = city_coordinates('Bench City')
+        cache = weather_row('Bench City', lat, lon, forecast_response(lat, lon, HOURLY_VARIABLES))
+        data = WeatherCacheSerializer(cache, context={'selection': FULL_FORECAST}).data
+        body = dumps(data)
+        iterations = options['iterations']
+
+        self.stdout.write(f"Full forecast body, {iterations} iterations per step")
+        for label, func in (
+            ("DRF JSONRenderer", lambda: JSONRenderer().render(data)),
+            ("orjson renderer", lambda: dumps(data)),
+            ("gzip per response", lambda: compress_string(body)),
+            ("precompress once", lambda: compress(body)),
+        ):
+            latencies = time_ms(func, iterations)
+            self.stdout.write(
+                f"{label:>18}: mean={statistics.fmean(latencies):.3f}ms "
+                f"p50={latencies[len(latencies) // 2]:.3f}ms "
+                f"p95={latencies[int(len(latencies) * 0.95)]:.3f}ms"
+            )
+
+        # Precompressed bodies cost nothing per response once cached; only the build pays for them
+        self.stdout.write("Bytes on the wire per response:")
+        self.stdout.write(f"{'identity':>18}: {len(body)}")
+        for coding, encoded in compress(body).items():
+            self.stdout.write(f"{coding:>18}: {len(encoded)} ({len(encoded) / len(body):.0%})")
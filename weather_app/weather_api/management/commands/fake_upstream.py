@@ -0,0 +1,32 @@
+# weather_api/management/commands/fake_upstream.py
+from django.core.management.base import BaseCommand
+from weather_api.fake_upstream import make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve fake geocoding and forecast APIs for benchmarks. Run the backend with "
+        "GEOCODE_URL=http://HOST:PORT/geo/1.0/direct and FORECAST_URL=http://HOST:PORT/v1/forecast."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8900)
+        parser.add_argument('--latency-ms', type=float, default=50.0, help="Mean response delay.")
+        parser.add_argument('--jitter-ms', type=float, default=10.0, help="Standard deviation of the delay.")
+        parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of requests answered with HTTP 500.")
+        parser.add_argument('--hang-rate', type=float, default=0.0, help="Share of requests that stall for --hang-seconds.")
+        parser.add_argument('--hang-seconds', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        server = make_server(
+            options['host'], options['port'], options['latency_ms'], options['jitter_ms'],
+            options['failure_rate'], options['hang_rate'], options['hang_seconds'],
+        )
+        self.stdout.write(f"Fake upstream listening on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,240 @@
+# weather_api/management/commands/manage_api_log_partitions.py
+import datetime
+import logging
+import re
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from weather_api.models import APIRequestLog, CustomUser
+
+logger = logging.getLogger(__name__)
+
+
+def _period_start(value, interval):
+    if interval == 'day':
+        return datetime.datetime(value.year, value.month, value.day, tzinfo=datetime.timezone.utc)
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def _next_period(start, interval):
+    if interval == 'day':
+        return start + datetime.timedelta(days=1)
+    return (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _partition_name(table, start, interval):
+    return f"{table}_p{start:%Y%m%d}" if interval == 'day' else f"{table}_p{start:%Y%m}"
+
+
+def _partition_bounds(name, table):
+    """Parse the ``[start, end)`` range back out of a partition name created by this command."""
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d{{8}}|\d{{6}})", name)
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 8:
+        start = datetime.datetime.strptime(digits, '%Y%m%d').replace(tzinfo=datetime.timezone.utc)
+        return start, _next_period(start, 'day')
+    start = datetime.datetime.strptime(digits, '%Y%m').replace(tzinfo=datetime.timezone.utc)
+    return start, _next_period(start, 'month')
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s AND relkind IN ('r', 'p')", [table])
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def create_partition(cursor, table, start, interval):
+    """
+    Create the partition for ``[start, end)`` unless it exists. Run inside a transaction.
+
+    Postgres refuses to add a range while the DEFAULT partition holds rows in it, so those rows are
+    moved over: the default is detached, the range created, the rows re-inserted through the parent
+    and the default attached again. Inserts into the log wait on the parent's lock meanwhile.
+    """
+    end = _next_period(start, interval)
+    name = _partition_name(table, start, interval)
+    default = f"{table}_default"
+    cursor.execute("SELECT to_regclass(%s), to_regclass(%s)", [f'"{name}"', f'"{default}"'])
+    exists, has_default = cursor.fetchone()
+    if exists:
+        return name
+
+    moved = False
+    if has_default:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE request_time >= %s AND request_time < %s)', [start, end]
+        )
+        moved = cursor.fetchone()[0]
+    if moved:
+        cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"')
+    cursor.execute(
+        f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    if moved:
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{default}" WHERE request_time >= %s AND request_time < %s RETURNING *) '
+            f'INSERT INTO "{table}" SELECT * FROM moved',
+            [start, end],
+        )
+        logger.info("api_log_partitions moved=%d from %s to %s", cursor.rowcount, default, name)
+        cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT')
+    return name
+
+
+def convert_to_partitioned(cursor, table, interval, keep_from):
+    """
+    Swap the plain Django-created table for a range-partitioned one with the same columns.
+
+    Rows older than ``keep_from`` are not copied. The primary key becomes (id, request_time)
+    because Postgres requires the partition key in every unique constraint; Django keeps
+    treating ``id`` as the primary key.
+    """
+    legacy = f"{table}_legacy"
+    sequence = f"{table}_part_id_seq"
+    user_table = CustomUser._meta.db_table
+
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+    cursor.execute(f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE (request_time)')
+    cursor.execute(f'CREATE SEQUENCE "{sequence}" OWNED BY "{table}".id')
+    cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{sequence}"\')')
+    cursor.execute(f'SELECT setval(\'"{sequence}"\', COALESCE((SELECT MAX(id) FROM "{legacy}"), 0) + 1, false)')
+    cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_part_pkey" PRIMARY KEY (id, request_time)')
+    cursor.execute(
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_user_id_fk" FOREIGN KEY (user_id) '
+        f'REFERENCES "{user_table}" (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    # Catch-all so an insert never fails if the partition job falls behind
+    cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+    cursor.execute(f'SELECT MIN(request_time) FROM "{legacy}" WHERE request_time >= %s', [keep_from])
+    oldest = cursor.fetchone()[0]
+    start = _period_start(oldest or timezone.now(), interval)
+    while start <= timezone.now():
+        create_partition(cursor, table, start, interval)
+        start = _next_period(start, interval)
+
+    cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{legacy}" WHERE request_time >= %s', [keep_from])
+    cursor.execute(f'DROP TABLE "{legacy}"')
+    # Only now: the legacy table took the index names along when it was renamed. The deferred
+    # user_id checks of the copied rows must run first, Postgres won't index with them pending
+    cursor.execute(f'SET CONSTRAINTS "{table}_user_id_fk" IMMEDIATE')
+    create_model_indexes(cursor, table)
+
+
+def create_model_indexes(cursor, table):
+    """
+    Create APIRequestLog's indexes on the partitioned table under the names Django's migrations record.
+
+    The SQL comes from the schema editor, so db_index fields get Django's generated names and
+    Meta.indexes their declared ones, and later migrations can find them. Indexes that already
+    exist are left alone; the names used by earlier versions of --convert are renamed.
+    """
+    editor = connection.schema_editor()
+    for old, new in (
+        (f"{table}_user_id_idx", editor._create_index_name(table, ['user_id'])),
+        (f"{table}_request_time_id_idx", APIRequestLog._meta.indexes[0].name),
+    ):
+        cursor.execute(f'ALTER INDEX IF EXISTS "{old}" RENAME TO "{new}"')
+    for statement in editor._model_indexes_sql(APIRequestLog):
+        cursor.execute(str(statement).replace('CREATE INDEX ', 'CREATE INDEX IF NOT EXISTS ', 1))
+
+
+def drop_expired_partitions(cursor, table, keep_from):
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = %s",
+        [table],
+    )
+    dropped = []
+    for (name,) in cursor.fetchall():
+        bounds = _partition_bounds(name, table)
+        if bounds and bounds[1] <= keep_from:
+            cursor.execute(f'DROP TABLE "{name}"')
+            dropped.append(name)
+    return dropped
+
+
+def delete_expired_rows(keep_from, batch_size=5000):
+    """Retention fallback for databases without partitioning."""
+    deleted = 0
+    while True:
+        ids = list(APIRequestLog.objects.filter(request_time__lt=keep_from).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += APIRequestLog.objects.filter(id__in=ids).delete()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain range partitions for the API request log on Postgres: create upcoming partitions "
+        "and drop the ones past API_LOG_RETENTION_DAYS. Use --convert once to partition an existing table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help="Convert the table to a partitioned one if it is not already.")
+        parser.add_argument('--interval', choices=['month', 'day'], default=settings.API_LOG_PARTITION_INTERVAL)
+        parser.add_argument('--ahead', type=int, default=2, help="Number of future partitions to keep created.")
+        parser.add_argument('--retention-days', type=int, default=settings.API_LOG_RETENTION_DAYS)
+        parser.add_argument('--loop', action='store_true', help="Keep running every --interval-seconds.")
+        parser.add_argument('--interval-seconds', type=int, default=3600)
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                failed = self.maintain(options)
+            except DatabaseError as e:
+                if not options['loop']:
+                    raise CommandError(f"API log partition maintenance failed: {e}") from e
+                logger.exception("API log partition maintenance failed")
+            else:
+                if failed and not options['loop']:
+                    raise CommandError(f"Could not create partitions: {', '.join(failed)}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval_seconds'])
+
+    def maintain(self, options):
+        """Create and drop partitions; returns the names of partitions that could not be created."""
+        table = APIRequestLog._meta.db_table
+        interval = options['interval']
+        keep_from = timezone.now() - datetime.timedelta(days=options['retention_days'])
+
+        if connection.vendor != 'postgresql':
+            deleted = delete_expired_rows(keep_from)
+            self.stdout.write(f"{connection.vendor} has no partitioning, deleted {deleted} expired log rows")
+            return []
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not is_partitioned(cursor, table):
+                if not options['convert']:
+                    raise CommandError(f"{table} is not partitioned yet, run with --convert first")
+                convert_to_partitioned(cursor, table, interval, keep_from)
+                self.stdout.write(f"Converted {table} to {interval}ly range partitions")
+            else:
+                create_model_indexes(cursor, table)
+
+        # One transaction per partition, and retention runs even if creating one of them failed
+        failed = []
+        start = _period_start(timezone.now(), interval)
+        for _ in range(options['ahead'] + 1):
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    create_partition(cursor, table, start, interval)
+            except DatabaseError:
+                logger.exception("Creating the %s partition of %s failed", f"{start:%Y-%m-%d}", table)
+                failed.append(_partition_name(table, start, interval))
+            start = _next_period(start, interval)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            dropped = drop_expired_partitions(cursor, table, keep_from)
+
+        logger.info("api_log_partitions dropped=%d", len(dropped))
+        self.stdout.write(f"Dropped {len(dropped)} expired partitions: {', '.join(dropped) or '-'}")
+        return failed
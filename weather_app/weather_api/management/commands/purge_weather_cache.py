@@ -0,0 +1,85 @@
+# weather_api/management/commands/purge_weather_cache.py
+import logging
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+from django.utils import timezone
+from weather_api.models import CellForecast, RefreshLease, WeatherObservation
+
+logger = logging.getLogger(__name__)
+
+
+def purge_expired(batch_size, retention_seconds):
+    """
+    Delete expired CellForecast rows, and the city rows pointing at them, in bounded batches so no
+    single DELETE holds locks for long.
+
+    Returns ``(rows_deleted, batches)``.
+    """
+    cutoff = timezone.now() - timezone.timedelta(seconds=retention_seconds)
+    deleted = batches = 0
+    while True:
+        ids = list(CellForecast.objects.filter(expiry_time__lt=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += CellForecast.objects.filter(id__in=ids).delete()[0]
+        batches += 1
+        if len(ids) < batch_size:
+            break
+
+    # Leases left behind by workers that died mid-refresh
+    RefreshLease.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted, batches
+
+
+def purge_history(batch_size, retention_days):
+    """Delete WeatherObservation hours older than ``retention_days`` in bounded batches; returns rows deleted."""
+    cutoff = timezone.now() - timezone.timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        ids = list(WeatherObservation.objects.filter(observed_at__lt=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += WeatherObservation.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    return deleted
+
+
+class Command(BaseCommand):
+    help = "Purge expired weather cache rows in batches, once or periodically with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--retention', type=int, default=settings.WEATHER_CACHE_RETENTION_SECONDS,
+            help="Seconds to keep expired rows around as a stale fallback.",
+        )
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=300)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            try:
+                deleted, batches = purge_expired(options['batch_size'], options['retention'])
+                history_deleted = purge_history(options['batch_size'], settings.WEATHER_HISTORY_RETENTION_DAYS)
+            except DatabaseError:
+                if not options['loop']:
+                    raise
+                logger.exception("Weather cache sweep failed")
+            else:
+                elapsed_ms = (time.monotonic() - started) * 1000
+                logger.info(
+                    "weather_cache_sweep rows_deleted=%d batches=%d history_deleted=%d duration_ms=%.1f",
+                    deleted, batches, history_deleted, elapsed_ms,
+                )
+                self.stdout.write(
+                    f"Purged {deleted} expired weather cache rows in {batches} batches "
+                    f"and {history_deleted} old history hours ({elapsed_ms:.1f} ms)"
+                )
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,109 @@
+# weather_api/management/commands/refresh_hot_cities.py
+import logging
+import random
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+from django.db.models import Count
+from django.utils import timezone
+from weather_api.geocoding import normalize_city_name
+from weather_api.models import APIRequestLog, WeatherCache
+from weather_api.refresh import refresh_cities_single_flight
+from weather_api.upstream import UpstreamError
+
+logger = logging.getLogger(__name__)
+
+
+def hot_cities(top_k, popularity_hours):
+    """Return up to ``top_k`` {city_key: city_name} of the most requested cities, most popular first."""
+    since = timezone.now() - timezone.timedelta(hours=popularity_hours)
+    counts = (
+        APIRequestLog.objects.filter(request_time__gte=since)
+        .values('city_name')
+        .annotate(hits=Count('id'))
+        .order_by('-hits')[:top_k * 4]
+    )
+    # Logged names are as typed, so fold spelling variants of the same city together
+    hits = {}
+    names = {}
+    for row in counts:
+        city_key = normalize_city_name(row['city_name'])
+        if not city_key or len(city_key) > 99:
+            continue
+        hits[city_key] = hits.get(city_key, 0) + row['hits']
+        names.setdefault(city_key, row['city_name'])
+    ranked = sorted(hits, key=hits.get, reverse=True)[:top_k]
+    return {city_key: names[city_key] for city_key in ranked}
+
+
+def due_for_refresh(cities, lead_seconds):
+    """The subset of ``cities`` whose row is missing, expired, or expires within ``lead_seconds``."""
+    refresh_before = timezone.now() + timezone.timedelta(seconds=lead_seconds)
+    fresh = set(
+        WeatherCache.objects.filter(city_key__in=list(cities), forecast__expiry_time__gt=refresh_before)
+        .values_list('city_key', flat=True)
+    )
+    return [city_name for city_key, city_name in cities.items() if city_key not in fresh]
+
+
+class Command(BaseCommand):
+    help = "Refresh the most requested cities shortly before their weather cache rows expire."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.REFRESH_AHEAD_TOP_K)
+        parser.add_argument('--lead', type=int, default=settings.REFRESH_AHEAD_LEAD_SECONDS, help="Seconds before expiry to refresh.")
+        parser.add_argument('--popularity-hours', type=int, default=settings.REFRESH_AHEAD_POPULARITY_HOURS)
+        parser.add_argument(
+            '--ranking-interval', type=int, default=settings.REFRESH_AHEAD_RANKING_SECONDS,
+            help="Seconds a computed popularity ranking is reused by --loop before the log is scanned again.",
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.REFRESH_AHEAD_BATCH_SIZE)
+        parser.add_argument('--jitter', type=float, default=settings.REFRESH_AHEAD_MAX_JITTER_SECONDS, help="Max random pause between batches.")
+        parser.add_argument('--loop', action='store_true', help="Keep running every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=60)
+
+    def handle(self, *args, **options):
+        self._hot = None
+        self._ranked_at = 0.0
+        while True:
+            try:
+                self.refresh(options)
+            except DatabaseError:
+                if not options['loop']:
+                    raise
+                logger.exception("Refresh-ahead run failed")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def hot_cities(self, options):
+        # Ranking scans hours of the request log, far more than one --interval of traffic changes it
+        if self._hot is None or time.monotonic() - self._ranked_at >= options['ranking_interval']:
+            self._hot = hot_cities(options['top_k'], options['popularity_hours'])
+            self._ranked_at = time.monotonic()
+        return self._hot
+
+    def refresh(self, options):
+        due = due_for_refresh(self.hot_cities(options), options['lead'])
+        # A neighbour's row only counts as fresh if it outlives the lead window too
+        fresh_until = timezone.now() + timezone.timedelta(seconds=options['lead'])
+        refreshed = failed = busy = 0
+        for start in range(0, len(due), options['batch_size']):
+            if start:
+                # Spread batches out so the upstream never sees one burst from us
+                time.sleep(random.uniform(0, options['jitter']))
+            batch = due[start:start + options['batch_size']]
+            try:
+                # Cities a request or revalidation is already fetching are left to it
+                rows, skipped = refresh_cities_single_flight(batch, fresh_until)
+                refreshed += len(rows)
+                busy += len(skipped)
+            except UpstreamError:
+                failed += len(batch)
+                logger.warning("Refresh-ahead batch of %d cities failed", len(batch), exc_info=True)
+
+        logger.info("refresh_ahead due=%d refreshed=%d busy=%d failed=%d", len(due), refreshed, busy, failed)
+        self.stdout.write(
+            f"Refreshed {refreshed} of {len(due)} hot cities due for refresh ({busy} already being refreshed, {failed} failed)"
+        )
@@ -0,0 +1,192 @@
+# weather_api/metrics.py
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+# Every metric registers itself here; render() walks this list in definition order
+REGISTRY = []
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+    def lines(self, values):
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(Counter):
+    """Prometheus histogram; each label set keeps per-bucket counts (last bucket is +Inf) plus the sum."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(counts) for key, counts in self._values.items()}
+
+    @staticmethod
+    def merge(value, other):
+        return [a + b for a, b in zip(value, other)]
+
+    def lines(self, values):
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                bucket_key = (*key, _number(bound) if bound != '+Inf' else bound)
+                yield f"{self.name}_bucket{_labels((*self.labelnames, 'le'), bucket_key)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(counts[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REQUEST_SECONDS = Histogram(
+    'weather_http_request_duration_seconds', "Time spent producing a response.", ('view', 'method', 'status'),
+)
+REQUEST_DB_QUERIES = Histogram(
+    'weather_http_request_db_queries', "Database queries run while handling one request.", ('view',), QUERY_COUNT_BUCKETS,
+)
+PHASE_SECONDS = Histogram(
+    'weather_request_phase_seconds', "Time spent in each phase of a weather lookup.", ('phase',),
+)
+UPSTREAM_SECONDS = Histogram(
+    'weather_upstream_request_seconds', "Upstream API calls by host and outcome.", ('host', 'outcome'),
+)
+UPSTREAM_SHORT_CIRCUITS = Counter(
+    'weather_upstream_short_circuits_total', "Upstream calls skipped because the host's circuit breaker was open.", ('host',),
+)
+
+
+@contextmanager
+def span(phase):
+    """Time the enclosed block into weather_request_phase_seconds{phase=...}. Also usable as a decorator."""
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.observe(time.perf_counter() - started, phase=phase)
+
+
+def snapshot():
+    return {metric.name: metric.snapshot() for metric in REGISTRY}
+
+
+# Each gunicorn worker has its own registry. With METRICS_MULTIPROC_DIR set, workers write their
+# snapshot there every few seconds and /metrics sums them, so any worker can answer a scrape.
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def _snapshot_path(pid):
+    return os.path.join(settings.METRICS_MULTIPROC_DIR, f"{pid}.json")
+
+
+def flush(force=False):
+    global _last_flush
+    if not settings.METRICS_MULTIPROC_DIR:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS:
+        return
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = now
+        data = {name: [[list(key), value] for key, value in values.items()] for name, values in snapshot().items()}
+        os.makedirs(settings.METRICS_MULTIPROC_DIR, exist_ok=True)
+        path = _snapshot_path(os.getpid())
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+    finally:
+        _flush_lock.release()
+
+
+def _collect():
+    if not settings.METRICS_MULTIPROC_DIR:
+        return snapshot()
+
+    flush(force=True)
+    metrics = {metric.name: metric for metric in REGISTRY}
+    merged = {name: {} for name in metrics}
+    for path in glob.glob(_snapshot_path('*')):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, values in data.items():
+            if name not in metrics:
+                continue
+            for key, value in values:
+                key = tuple(key)
+                current = merged[name].get(key)
+                merged[name][key] = value if current is None else metrics[name].merge(current, value)
+    return merged
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    values = _collect()
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.lines(values.get(metric.name, {})))
+    return '\n'.join(lines) + '\n'
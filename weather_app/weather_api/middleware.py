@@ -0,0 +1,61 @@
+# weather_api/middleware.py
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from . import metrics
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Record request latency per view and, for sync requests, how many DB queries the request ran.
+
+    Works under both WSGI and ASGI without forcing a thread switch for async views. Queries made
+    by async views happen on executor threads and are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        queries = _QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        view = self._observe(request, response, started)
+        metrics.REQUEST_DB_QUERIES.observe(queries.count, view=view)
+        metrics.flush()
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, started)
+        metrics.flush()
+        return response
+
+    @staticmethod
+    def _observe(request, response, started):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, view=view, method=request.method, status=response.status_code)
+        return view
@@ -58,22 +58,109 @@ class CustomUser(AbstractUser):
 # Location history
 class LocationHistory(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    city_key = models.CharField(max_length=100)
     city_name = models.CharField(max_length=100)
     latitude = models.FloatField()
     longitude = models.FloatField()
-    search_time = models.DateTimeField(auto_now_add=True)
+    search_time = models.DateTimeField(default=timezone.now)
 
-# Cached weather data
-class WeatherCache(models.Model):
+    class Meta:
+        constraints = [
+            # One entry per user and city, bumped on every search
+            models.UniqueConstraint(fields=['user', 'city_key'], name='locationhistory_user_city_uniq'),
+        ]
+        indexes = [
+            # Covers get_user_search_history (index-only scan on Postgres)
+            models.Index(
+                fields=['user', '-search_time'],
+                include=['city_name', 'latitude', 'longitude'],
+                name='locationhistory_user_time_idx',
+            ),
+        ]
+
+# Geocoded coordinates, keyed by the normalized city name
+class GeocodeCache(models.Model):
+    city_key = models.CharField(max_length=100, unique=True)
     city_name = models.CharField(max_length=100)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+# Cached forecast for one lat/lon grid cell (grid.grid_cell), shared by every city geocoded into it
+class CellForecast(models.Model):
+    cell_key = models.CharField(max_length=32, unique=True)
     temperature = models.FloatField()
     humidity = models.IntegerField()
     wind_speed = models.FloatField()
-    forecast_data = models.JSONField()
-    cached_at = models.DateTimeField(auto_now_add=True)
-    expiry_time = models.DateTimeField()
+    # Open-Meteo hourly block packed by forecast_codec.encode_hourly
+    forecast_blob = models.BinaryField()
+    # Set on every upsert, so it doubles as the forecast version
+    cached_at = models.DateTimeField(default=timezone.now)
+    expiry_time = models.DateTimeField(db_index=True)
+
+class WeatherCacheManager(models.Manager):
+    def get_queryset(self):
+        # A city row is only ever read for its forecast
+        return super().get_queryset().select_related('forecast')
+
+# Cached weather per city name: the geocoded place and the grid cell whose forecast it serves
+class WeatherCache(models.Model):
+    city_key = models.CharField(max_length=100, unique=True)
+    city_name = models.CharField(max_length=100)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    # Refreshing a cell updates its CellForecast in place; the city rows pointing at it are left alone
+    forecast = models.ForeignKey(
+        CellForecast, to_field='cell_key', db_column='cell_key', on_delete=models.CASCADE, related_name='cities',
+    )
+
+    objects = WeatherCacheManager()
+
+    @property
+    def cell_key(self):
+        return self.forecast_id
+
+    @property
+    def temperature(self):
+        return self.forecast.temperature
+
+    @property
+    def humidity(self):
+        return self.forecast.humidity
+
+    @property
+    def wind_speed(self):
+        return self.forecast.wind_speed
+
+    @property
+    def forecast_blob(self):
+        return self.forecast.forecast_blob
+
+    @property
+    def cached_at(self):
+        return self.forecast.cached_at
+
+    @property
+    def expiry_time(self):
+        return self.forecast.expiry_time
+
+# Hourly weather history per grid cell, appended from every upstream forecast (see history.py)
+class WeatherObservation(models.Model):
+    cell_key = models.CharField(max_length=32)
+    observed_at = models.DateTimeField()
+    temperature_2m = models.FloatField(null=True)
+    relative_humidity_2m = models.FloatField(null=True)
+    wind_speed_10m = models.FloatField(null=True)
+    dew_point_2m = models.FloatField(null=True)
+    precipitation_probability = models.FloatField(null=True)
+    surface_pressure = models.FloatField(null=True)
+    wind_direction_10m = models.FloatField(null=True)
+
+    class Meta:
+        constraints = [
+            # One row per cell and hour, first write wins; also the index for range queries
+            models.UniqueConstraint(fields=['cell_key', 'observed_at'], name='weatherobservation_cell_hour_uniq'),
+        ]
 
 # API request log
 class APIRequestLog(models.Model):
@@ -81,5 +168,19 @@ class APIRequestLog(models.Model):
     city_name = models.CharField(max_length=100)
     request_url = models.TextField()
     response_status = models.IntegerField()
-    response_data = models.JSONField()
-    request_time = models.DateTimeField(auto_now_add=True)
+    response_data = models.JSONField(null=True, blank=True)
+    # On Postgres the table is range-partitioned on this column (see manage_api_log_partitions)
+    # Set when the request is logged, not when the buffered writer flushes the row
+    request_time = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the admin log listing
+            models.Index(fields=['-request_time', '-id'], name='apilog_time_id_idx'),
+        ]
+
+# Cross-worker lease so only one worker refreshes a given city at a time
+class RefreshLease(models.Model):
+    key = models.CharField(max_length=150, unique=True)
+    owner = models.CharField(max_length=32)
+    expires_at = models.DateTimeField()
@@ -0,0 +1,56 @@
+# weather_api/pagination.py
+import base64
+import binascii
+import json
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def page_size(request):
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the list of values stored in an opaque ``cursor`` string."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PaginationError("Invalid cursor")
+
+
+def parse_time(request, name):
+    raw = request.query_params.get(name)
+    if raw is None:
+        return None
+    value = parse_datetime(raw)
+    if value is None:
+        raise PaginationError(f"{name} must be an ISO 8601 datetime")
+    return value
+
+
+def keyset_page(queryset, limit):
+    """
+    Fetch one page from an already ordered and cursor-filtered queryset.
+
+    Returns ``(rows, last_row)`` where ``last_row`` is None on the final page.
+    """
+    rows = list(queryset[:limit + 1])
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]
+    return rows, None
@@ -0,0 +1,134 @@
+# weather_api/refresh.py
+import logging
+import threading
+from django.conf import settings
+from django.db import connections
+from . import history, response_cache
+from .geocoding import geocode, normalize_city_name
+from .grid import cell_center, grid_cell
+from .singleflight import acquire_lease, release_lease, weather_lease_key
+from .upstream import fetch_forecasts
+from .weather_store import cell_forecast, city_row, fresh_cell_forecasts, has_weather, upsert_weather
+
+logger = logging.getLogger(__name__)
+
+# City keys this worker is revalidating right now, so a burst of stale hits starts one thread
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def fetch_cities(cities, fresh_until=None):
+    """
+    Store current weather for ``cities`` ({city_key: (city_name, lat, lon)}), calling upstream at most once per grid cell.
+
+    A city whose cell already has a forecast valid at ``fresh_until`` (default now) reuses it. The
+    remaining cells are fetched in one multi-coordinate Open-Meteo request at their centres and
+    stored once per cell. Returns ``(weather_url, {city_key: (row, weather_response)})``:
+    ``weather_url`` is None if nothing was fetched, ``weather_response`` is None for reused
+    forecasts, and cities upstream had no data for are left out. Raises UpstreamError if the
+    forecast request fails.
+    """
+    cells = {city_key: grid_cell(lat, lon) for city_key, (_, lat, lon) in cities.items()}
+    forecasts = fresh_cell_forecasts(set(cells.values()), fresh_until)
+
+    weather_url = None
+    responses = {}
+    missing = list(dict.fromkeys(cell_key for cell_key in cells.values() if cell_key not in forecasts))
+    if missing:
+        weather_url, weather_responses = fetch_forecasts([cell_center(cell_key) for cell_key in missing])
+        responses = {
+            cell_key: weather_response
+            for cell_key, weather_response in zip(missing, weather_responses)
+            if has_weather(weather_response)
+        }
+        history.record(responses)
+    new_forecasts = [cell_forecast(cell_key, weather_response) for cell_key, weather_response in responses.items()]
+    forecasts.update((forecast.cell_key, forecast) for forecast in new_forecasts)
+
+    fetched = {}
+    for city_key, (city_name, lat, lon) in cities.items():
+        cell_key = cells[city_key]
+        if cell_key in forecasts:
+            fetched[city_key] = (city_row(city_name, lat, lon, forecasts[cell_key]), responses.get(cell_key))
+    upsert_weather(new_forecasts, [row for row, _ in fetched.values()])
+    return weather_url, fetched
+
+
+def refresh_cities(city_names, fresh_until=None):
+    """
+    Re-fetch ``city_names`` and upsert their rows, one upstream request for all of them.
+
+    Cities that cannot be geocoded are skipped. A city whose grid cell has a forecast still valid
+    at ``fresh_until`` keeps that forecast instead of fetching a new one. Returns the refreshed
+    WeatherCache rows; raises UpstreamError if the forecast request fails.
+    """
+    cities = {}
+    for city_name in city_names:
+        found = geocode(city_name)
+        if found is not None:
+            cities.setdefault(normalize_city_name(city_name), (city_name, *found))
+    if not cities:
+        return []
+
+    _, fetched = fetch_cities(cities, fresh_until)
+    rows = [row for row, _ in fetched.values()]
+    # Responses rendered from the previous rows would otherwise be served until those expire
+    response_cache.invalidate(*[row.city_key for row in rows])
+    return rows
+
+
+def refresh_cities_single_flight(city_names, fresh_until=None):
+    """
+    refresh_cities() for the cities nobody else is refreshing, under their single-flight leases.
+
+    A city whose lease is held (a request, a background revalidation or the refresh-ahead job is
+    already fetching it) is skipped. Returns ``(rows, skipped_city_names)``.
+    """
+    leases = {}
+    skipped = []
+    try:
+        for city_name in city_names:
+            lease_key = weather_lease_key(normalize_city_name(city_name))
+            if lease_key in leases:
+                continue
+            owner = acquire_lease(lease_key, settings.WEATHER_REFRESH_LEASE_SECONDS)
+            if owner is None:
+                skipped.append(city_name)
+            else:
+                leases[lease_key] = (owner, city_name)
+        rows = refresh_cities([city_name for _, city_name in leases.values()], fresh_until) if leases else []
+    finally:
+        for lease_key, (owner, _) in leases.items():
+            release_lease(lease_key, owner)
+    return rows, skipped
+
+
+def _revalidate(city_name, city_key):
+    try:
+        refresh_cities_single_flight([city_name])
+    except Exception:
+        logger.exception("Background refresh of %s failed", city_name)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(city_key)
+        # The thread ends here; with persistent connections nothing else would close its connection
+        connections.close_all()
+
+
+def revalidate_in_background(city_name):
+    """
+    Refresh a just-expired city on a background thread while the caller serves the stale row.
+
+    No-op if this worker is already revalidating the city; other workers are kept out by the lease.
+    """
+    city_key = normalize_city_name(city_name)
+    with _in_flight_lock:
+        if city_key in _in_flight:
+            return
+        _in_flight.add(city_key)
+    try:
+        threading.Thread(target=_revalidate, args=(city_name, city_key), name="weather-revalidate", daemon=True).start()
+    except Exception:
+        with _in_flight_lock:
+            _in_flight.discard(city_key)
+        raise
@@ -0,0 +1,31 @@
+# weather_api/renderers.py
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Types orjson does not know natively (Decimal, lazy strings, querysets...) are converted the way DRF's encoder does
+_fallback = JSONEncoder().default
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes, as DRF's JSONRenderer would produce them (UTC datetimes end in "Z")."""
+    return orjson.dumps(data, default=_fallback, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson. ``; indent=`` in the Accept header is ignored."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+class ORJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
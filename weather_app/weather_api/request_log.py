@@ -0,0 +1,143 @@
+# weather_api/request_log.py
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from .metrics import span
+from .models import APIRequestLog
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_NONE = 'none'
+PAYLOAD_SUMMARY = 'summary'
+PAYLOAD_FULL = 'full'
+
+
+class BufferedLogWriter:
+    """
+    Collects model instances in memory and writes them with bulk_create from a background thread.
+
+    A batch is flushed once it reaches ``batch_size`` rows or ``flush_interval`` seconds after its
+    first row, whichever comes first. When the buffer is full new rows are dropped rather than
+    slowing down requests.
+    """
+
+    def __init__(self, model, batch_size, flush_interval, max_pending):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Threads do not survive gunicorn's fork, so every worker starts its own
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_pending)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f"{self.model.__name__}-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, instance):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(instance)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("%s buffer full, dropped row (%d dropped so far)", self.model.__name__, self.dropped)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            self.model.objects.bulk_create(batch)
+        except Exception:
+            logger.exception("Failed to write %d %s rows", len(batch), self.model.__name__)
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """Write whatever is still buffered in this process, on the calling thread."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+
+
+api_log_writer = BufferedLogWriter(
+    APIRequestLog,
+    batch_size=settings.API_LOG_BATCH_SIZE,
+    flush_interval=settings.API_LOG_FLUSH_SECONDS,
+    max_pending=settings.API_LOG_MAX_PENDING,
+)
+atexit.register(api_log_writer.flush)
+
+
+def weather_summary(latitude, longitude, temperature, humidity, wind_speed):
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'temperature': temperature,
+        'humidity': humidity,
+        'wind_speed': wind_speed,
+    }
+
+
+@span('log_write')
+def log_api_request(user, city_name, request_url, response_status, summary, full_response):
+    """
+    Record one APIRequestLog row according to API_LOG_PAYLOAD_MODE.
+
+    ``full_response`` is a zero-argument callable so the complete payload is only built in "full" mode.
+    """
+    mode = settings.API_LOG_PAYLOAD_MODE
+    if mode == PAYLOAD_FULL:
+        response_data = full_response()
+    elif mode == PAYLOAD_SUMMARY:
+        response_data = summary
+    else:
+        response_data = None
+
+    log = APIRequestLog(
+        user=user,
+        city_name=city_name,
+        request_url=request_url,
+        response_status=response_status,
+        response_data=response_data,
+        request_time=timezone.now(),
+    )
+    if settings.API_LOG_BUFFERED:
+        api_log_writer.write(log)
+    else:
+        log.save()
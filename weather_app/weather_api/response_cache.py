@@ -0,0 +1,154 @@
+# weather_api/response_cache.py
+import hashlib
+import time
+import uuid
+import zlib
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import caches
+from .compression import compress
+from .forecast_codec import selection_key
+from .lru import LRUCache
+from .metrics import span
+from .renderers import dumps
+from .request_log import weather_summary
+from .serializers import WeatherCacheSerializer
+
+# Pre-serialized get_weather body plus what the view still needs without re-reading the row.
+# etag and last_modified (a Unix timestamp) are the HTTP validators of the body, and encoded holds
+# the body precompressed as {content_coding: bytes}.
+CachedResponse = namedtuple('CachedResponse', ['body', 'latitude', 'longitude', 'expires_at', 'summary', 'etag', 'last_modified', 'encoded'])
+
+# Per-worker tier. Entries live at most RESPONSE_CACHE_LOCAL_TTL seconds, which bounds how long
+# another worker's invalidation can take to reach this one.
+_local = LRUCache(settings.RESPONSE_CACHE_LOCAL_SIZE)
+
+
+def _shared():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _hash(city_key):
+    # City keys are user input (spaces, non-ASCII), which memcached does not accept in cache keys
+    return hashlib.sha256(city_key.encode()).hexdigest()
+
+
+# Every city has a generation token that is part of all its response keys. Invalidating a city
+# drops the token, which orphans every variant (?fields=/?hours=) cached for it at once.
+def _generation_key(city_key):
+    return f"weather-response-gen:{_hash(city_key)}"
+
+
+def _generation(city_key):
+    key = _generation_key(city_key)
+    generation = _local.get(key)
+    if generation is None:
+        generation = _shared().get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex[:12]
+            if not _shared().add(key, generation, None):
+                generation = _shared().get(key)
+        _local.set(key, generation, settings.RESPONSE_CACHE_LOCAL_TTL)
+    return generation
+
+
+async def _ageneration(city_key):
+    key = _generation_key(city_key)
+    generation = _local.get(key)
+    if generation is None:
+        generation = await _shared().aget(key)
+        if generation is None:
+            generation = uuid.uuid4().hex[:12]
+            if not await _shared().aadd(key, generation, None):
+                generation = await _shared().aget(key)
+        _local.set(key, generation, settings.RESPONSE_CACHE_LOCAL_TTL)
+    return generation
+
+
+def _key(city_key, generation, selection):
+    # v3: CachedResponse gained encoded
+    # Hashed together: a long ?fields= list would also push the key past memcached's 250 bytes
+    return f"weather-response:v3:{generation}:{_hash(f'{city_key}|{selection_key(selection)}')}"
+
+
+# Entries outlive their row by the stale-while-revalidate window so that every stale reader is
+# answered from the cache while a single background refresh runs; that refresh invalidates them.
+def _ttl(entry):
+    return entry.expires_at + settings.WEATHER_STALE_WHILE_REVALIDATE_SECONDS - time.time()
+
+
+def _local_ttl(entry):
+    return min(settings.RESPONSE_CACHE_LOCAL_TTL, _ttl(entry))
+
+
+def _etag(cache, selection):
+    # The body is fully determined by the forecast version (cached_at changes on every upsert), the
+    # city the cell's forecast is served for, and the selection
+    version = int(cache.cached_at.timestamp() * 1_000_000)
+    variant = f'{cache.city_name}|{cache.latitude}|{cache.longitude}|{selection_key(selection)}'
+    return f'"{version:x}-{zlib.crc32(variant.encode()):08x}"'
+
+
+@span('serialize')
+def _build(cache, selection):
+    body = dumps(WeatherCacheSerializer(cache, context={'selection': selection}).data)
+    summary = weather_summary(cache.latitude, cache.longitude, cache.temperature, cache.humidity, cache.wind_speed)
+    return CachedResponse(
+        body, cache.latitude, cache.longitude, cache.expiry_time.timestamp(), summary,
+        _etag(cache, selection), int(cache.cached_at.timestamp()), compress(body),
+    )
+
+
+@span('cache_lookup')
+def get(city_key, selection):
+    """
+    Return the CachedResponse for ``city_key`` from the local tier, then the shared tier, or None.
+
+    The entry may be up to WEATHER_STALE_WHILE_REVALIDATE_SECONDS past its expires_at.
+    """
+    key = _key(city_key, _generation(city_key), selection)
+    entry = _local.get(key)
+    if entry is None:
+        entry = _shared().get(key)
+        if entry is not None and _local_ttl(entry) > 0:
+            _local.set(key, entry, _local_ttl(entry))
+    return entry
+
+
+async def aget(city_key, selection):
+    with span('cache_lookup'):
+        key = _key(city_key, await _ageneration(city_key), selection)
+        entry = _local.get(key)
+        if entry is None:
+            entry = await _shared().aget(key)
+            if entry is not None and _local_ttl(entry) > 0:
+                _local.set(key, entry, _local_ttl(entry))
+        return entry
+
+
+def store(city_key, cache, selection):
+    """Serialize a WeatherCache row once and keep the bytes in both tiers until it is too stale to serve."""
+    entry = _build(cache, selection)
+    ttl = _ttl(entry)
+    if ttl > 0:
+        key = _key(city_key, _generation(city_key), selection)
+        _shared().set(key, entry, ttl)
+        _local.set(key, entry, _local_ttl(entry))
+    return entry
+
+
+async def astore(city_key, cache, selection):
+    entry = _build(cache, selection)
+    ttl = _ttl(entry)
+    if ttl > 0:
+        key = _key(city_key, await _ageneration(city_key), selection)
+        await _shared().aset(key, entry, ttl)
+        _local.set(key, entry, _local_ttl(entry))
+    return entry
+
+
+def invalidate(*city_keys):
+    keys = [_generation_key(city_key) for city_key in city_keys]
+    for key in keys:
+        _local.delete(key)
+    _shared().delete_many(keys)
@@ -1,6 +1,8 @@
 # weather_api/serializers.py
 from rest_framework import serializers
+from .forecast_codec import FULL_FORECAST, decode_hourly
 from .models import CustomUser, LocationHistory, WeatherCache
+from .units import TEMPERATURE_LABELS, WIND_SPEED_LABELS, convert_temperature, convert_wind_speed
 
 class CustomUserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False, min_length=8)
@@ -16,6 +18,33 @@ class LocationHistorySerializer(serializers.ModelSerializer):
         fields = ['id', 'city_name', 'latitude', 'longitude', 'search_time']
 
 class WeatherCacheSerializer(serializers.ModelSerializer):
+    # Decoded from the packed forecast_blob only when serializing, shaped by the "selection" context
+    forecast_data = serializers.SerializerMethodField()
+    temperature = serializers.SerializerMethodField()
+    wind_speed = serializers.SerializerMethodField()
+    units = serializers.SerializerMethodField()
+    # Properties reading the cell's CellForecast, so not picked up as model fields
+    cached_at = serializers.DateTimeField(read_only=True)
+    expiry_time = serializers.DateTimeField(read_only=True)
+
     class Meta:
         model = WeatherCache
-        fields = ['city_name', 'latitude', 'longitude', 'temperature', 'humidity', 'wind_speed', 'forecast_data', 'cached_at', 'expiry_time']
+        fields = ['city_name', 'latitude', 'longitude', 'temperature', 'humidity', 'wind_speed', 'units', 'forecast_data', 'cached_at', 'expiry_time']
+
+    def _selection(self):
+        return self.context.get('selection', FULL_FORECAST)
+
+    def get_forecast_data(self, obj):
+        return decode_hourly(obj.forecast_blob, self._selection())
+
+    def get_temperature(self, obj):
+        return round(convert_temperature(obj.temperature, self._selection().temperature_unit), 2)
+
+    def get_wind_speed(self, obj):
+        return round(convert_wind_speed(obj.wind_speed, self._selection().wind_speed_unit), 2)
+
+    def get_units(self, obj):
+        return {
+            'temperature': TEMPERATURE_LABELS[self._selection().temperature_unit],
+            'wind_speed': WIND_SPEED_LABELS[self._selection().wind_speed_unit],
+        }
@@ -0,0 +1,21 @@
+# weather_api/signals.py
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import invalidate_token
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    # Covers logout and account deletion, whose cascade deletes the token
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    # The cached token carries the user's is_active flag; deactivating an account must not be served stale
+    if not created:
+        for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            invalidate_token(key)
@@ -0,0 +1,35 @@
+# weather_api/singleflight.py
+import uuid
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import RefreshLease
+
+
+def weather_lease_key(city_key):
+    return f"weather:{city_key}"
+
+
+def acquire_lease(key, ttl):
+    """
+    Try to become the single worker allowed to refresh ``key``.
+
+    Returns an owner token on success, or None if another worker holds a live lease.
+    """
+    owner = uuid.uuid4().hex
+    now = timezone.now()
+    expires_at = now + timezone.timedelta(seconds=ttl)
+
+    # Take over a lease left behind by a worker that died mid-refresh
+    if RefreshLease.objects.filter(key=key, expires_at__lt=now).update(owner=owner, expires_at=expires_at):
+        return owner
+
+    try:
+        with transaction.atomic():
+            RefreshLease.objects.create(key=key, owner=owner, expires_at=expires_at)
+    except IntegrityError:
+        return None
+    return owner
+
+
+def release_lease(key, owner):
+    RefreshLease.objects.filter(key=key, owner=owner).delete()
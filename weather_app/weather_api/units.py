@@ -0,0 +1,36 @@
+# weather_api/units.py
+# Unit conversion for the user's preferred_temperature_unit / preferred_wind_speed_unit.
+# Works on scalars and NumPy arrays alike, so whole forecast columns convert in one step.
+
+CELSIUS = 0
+FAHRENHEIT = 1
+KMH = 0
+KNOTS = 1
+
+KMH_TO_KNOTS = 0.539957
+
+TEMPERATURE_VARIABLES = {'temperature_2m', 'dew_point_2m'}
+WIND_SPEED_VARIABLES = {'wind_speed_10m'}
+
+TEMPERATURE_LABELS = {CELSIUS: '°C', FAHRENHEIT: '°F'}
+WIND_SPEED_LABELS = {KMH: 'km/h', KNOTS: 'kn'}
+
+
+def convert_temperature(value, unit):
+    if unit == FAHRENHEIT:
+        return value * 9 / 5 + 32
+    return value
+
+
+def convert_wind_speed(value, unit):
+    if unit == KNOTS:
+        return value * KMH_TO_KNOTS
+    return value
+
+
+def convert_variable(name, values, temperature_unit, wind_speed_unit):
+    if name in TEMPERATURE_VARIABLES:
+        return convert_temperature(values, temperature_unit)
+    if name in WIND_SPEED_VARIABLES:
+        return convert_wind_speed(values, wind_speed_unit)
+    return values
@@ -0,0 +1,259 @@
+# weather_api/upstream.py
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .metrics import UPSTREAM_SECONDS, UPSTREAM_SHORT_CIRCUITS, span
+
+GEOCODE_URL = settings.GEOCODE_URL
+FORECAST_URL = settings.FORECAST_URL
+HOURLY_VARIABLES = [
+    'temperature_2m', 'relative_humidity_2m', 'wind_speed_10m', 'dew_point_2m',
+    'precipitation_probability', 'surface_pressure', 'wind_direction_10m',
+]
+FORECAST_VARIABLES = ','.join(HOURLY_VARIABLES)
+
+
+class UpstreamError(Exception):
+    """An upstream call timed out, failed, or did not return JSON."""
+
+
+class UpstreamUnavailable(UpstreamError):
+    """The host's circuit breaker is open, so the call was not attempted."""
+
+
+class _RetryableError(Exception):
+    """A failed attempt worth retrying: connection error, 5xx or a body that is not JSON."""
+
+
+def _read_timeout(url):
+    return settings.UPSTREAM_READ_TIMEOUTS.get(urlsplit(url).hostname, settings.UPSTREAM_DEFAULT_READ_TIMEOUT)
+
+
+class CircuitBreaker:
+    """
+    Per-worker breaker for one upstream host.
+
+    After UPSTREAM_BREAKER_FAILURES consecutive failed calls it opens and every call fails fast.
+    Every UPSTREAM_BREAKER_RESET_SECONDS one trial call is let through: success closes the
+    breaker, failure keeps it open for another period.
+    """
+
+    def __init__(self):
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < settings.UPSTREAM_BREAKER_RESET_SECONDS:
+                return False
+            # Restart the period so only this call gets through, even if it never reports back
+            self._opened_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= settings.UPSTREAM_BREAKER_FAILURES:
+                self._opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(host):
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+def _backoff(attempt):
+    """Full-jitter exponential backoff before retry number ``attempt`` (1-based)."""
+    return random.uniform(0, settings.UPSTREAM_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+
+def _check_response(status_code, parse_json):
+    if status_code >= 500:
+        raise _RetryableError(f"HTTP {status_code}")
+    if status_code >= 400:
+        # The request itself is wrong (bad key, bad parameters); retrying or tripping the breaker would not help
+        raise UpstreamError(f"HTTP {status_code}")
+    try:
+        return parse_json()
+    except ValueError as e:
+        raise _RetryableError(type(e).__name__) from e
+
+
+# Keep-alive pool shared by every request handled in this (sync) worker
+_session = requests.Session()
+_session.mount('http://', HTTPAdapter(pool_maxsize=settings.UPSTREAM_POOL_SIZE))
+_session.mount('https://', HTTPAdapter(pool_maxsize=settings.UPSTREAM_POOL_SIZE))
+
+
+def _get_once(url, params):
+    try:
+        response = _session.get(url, params=params, timeout=(settings.UPSTREAM_CONNECT_TIMEOUT, _read_timeout(url)))
+    except requests.ConnectionError as e:
+        # Read timeouts are not retried: a host that is merely slow would hold the worker several times over
+        raise _RetryableError(type(e).__name__) from e
+    return _check_response(response.status_code, response.json)
+
+
+def get_json(url, params=None):
+    """
+    GET ``url`` and return the decoded JSON body.
+
+    Connection errors, 5xx and non-JSON replies are retried up to UPSTREAM_MAX_RETRIES times with
+    jittered backoff. Raises UpstreamError once the call has failed, or UpstreamUnavailable without
+    calling out when the host's circuit breaker is open.
+    """
+    host = urlsplit(url).hostname
+    host_breaker = breaker(host)
+    if not host_breaker.allow():
+        UPSTREAM_SHORT_CIRCUITS.inc(host=host)
+        raise UpstreamUnavailable(f"GET {host} skipped: circuit open")
+
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            data = _get_once(url, params)
+        except _RetryableError as e:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, outcome='error')
+            if attempt < settings.UPSTREAM_MAX_RETRIES:
+                attempt += 1
+                time.sleep(_backoff(attempt))
+                continue
+            host_breaker.record_failure()
+            raise UpstreamError(f"GET {host} failed: {e}") from e
+        except UpstreamError:
+            # A 4xx: the host is up and answered, it just refused this request
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, outcome='error')
+            host_breaker.record_success()
+            raise
+        except requests.RequestException as e:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, outcome='error')
+            host_breaker.record_failure()
+            raise UpstreamError(f"GET {host} failed: {type(e).__name__}") from e
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, outcome='ok')
+        host_breaker.record_success()
+        return data
+
+
+# The async client is bound to the event loop it was created on, so keep one per loop
+_async_client = None
+_async_client_loop = None
+
+
+def _get_async_client():
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_POOL_SIZE,
+                max_keepalive_connections=settings.UPSTREAM_POOL_SIZE,
+            ),
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def _aget_once(url, params):
+    timeout = httpx.Timeout(_read_timeout(url), connect=settings.UPSTREAM_CONNECT_TIMEOUT)
+    try:
+        response = await _get_async_client().get(url, params=params, timeout=timeout)
+    except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+        raise _RetryableError(type(e).__name__) from e
+    return _check_response(response.status_code, response.json)
+
+
+async def aget_json(url, params=None):
+    """Async version of get_json(); shares its retry policy and circuit breakers."""
+    host = urlsplit(url).hostname
+    host_breaker = breaker(host)
+    if not host_breaker.allow():
+        UPSTREAM_SHORT_CIRCUITS.inc(host=host)
+        raise UpstreamUnavailable(f"GET {host} skipped: circuit open")
+
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            data = await _aget_once(url, params)
+        except _RetryableError as e:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, outcome='error')
+            if attempt < settings.UPSTREAM_MAX_RETRIES:
+                attempt += 1
+                await asyncio.sleep(_backoff(attempt))
+                continue
+            host_breaker.record_failure()
+            raise UpstreamError(f"GET {host} failed: {e}") from e
+        except UpstreamError:
+            # A 4xx: the host is up and answered, it just refused this request
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, outcome='error')
+            host_breaker.record_success()
+            raise
+        except httpx.HTTPError as e:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, outcome='error')
+            host_breaker.record_failure()
+            raise UpstreamError(f"GET {host} failed: {type(e).__name__}") from e
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host, outcome='ok')
+        host_breaker.record_success()
+        return data
+
+
+def _geocode_params(city_name):
+    return {'q': city_name, 'appid': settings.OPENWEATHER_API_KEY}
+
+
+def _coordinates(geo_response):
+    if not geo_response:
+        return None
+    # Use the last result's latitude and longitude
+    return geo_response[-1]['lat'], geo_response[-1]['lon']
+
+
+def fetch_coordinates(city_name):
+    return _coordinates(get_json(GEOCODE_URL, _geocode_params(city_name)))
+
+
+async def afetch_coordinates(city_name):
+    return _coordinates(await aget_json(GEOCODE_URL, _geocode_params(city_name)))
+
+
+def forecasts_url(coordinates):
+    latitudes = ','.join(str(lat) for lat, _ in coordinates)
+    longitudes = ','.join(str(lon) for _, lon in coordinates)
+    return f"{FORECAST_URL}?latitude={latitudes}&longitude={longitudes}&current={FORECAST_VARIABLES}&hourly={FORECAST_VARIABLES}"
+
+
+@span('forecast')
+def fetch_forecasts(coordinates):
+    """
+    Fetch several locations in one Open-Meteo request.
+
+    Returns ``(weather_url, weather_responses)`` with one response per coordinate pair, in order.
+    """
+    weather_url = forecasts_url(coordinates)
+    weather_responses = get_json(weather_url)
+    # Open-Meteo answers a single location with an object and several with a list
+    if isinstance(weather_responses, dict):
+        weather_responses = [weather_responses]
+    return weather_url, weather_responses
@@ -14,15 +14,23 @@ urlpatterns = [
     path('role/', views.roles, name='roles'),
     path("register/", views.registration, name="register"),
     path('token/', auth_views.obtain_auth_token, name='token'),
+    path('logout/', views.logout, name='logout'),
     path('weather/<str:city_name>', views.get_weather, name='get_weather'),
+    path('weather-batch/', views.get_weather_batch, name='get_weather_batch'),
+    path('async/weather/<str:city_name>', views.get_weather_async, name='get_weather_async'),
+    path('history/<str:city_name>', views.get_weather_history, name='get_weather_history'),
+    path('cities/suggest', views.suggest_cities, name='suggest_cities'),
     path('search-history/', views.get_user_search_history, name='user-search-history'),
     path('search-history/<int:id>', views.delete_search_history, name='delete-search-history'),
     path('gdpr/', views.delete_user_account, name='gdpr-deletion'),
     path('user/', views.user_info, name='user_info'),
+    path('metrics', views.metrics, name='metrics'),
 
     # Admin Routes
     path('admin/users/', views.list_all_users, name='list_all_users'),
     path('admin/cache/', views.delete_all_cache, name='delete_all_cache'),
     path('admin/cache/<str:city_name>', views.delete_all_city_cache, name='delete_all_city_cache'),
     path('admin/api-logs/', views.get_api_logs, name='get_api_logs'),
+    path('admin/export/api-logs.<str:export_format>', views.export_api_logs, name='export_api_logs'),
+    path('admin/export/search-history.<str:export_format>', views.export_search_history, name='export_search_history'),
 ]
@@ -1,20 +1,44 @@
 # weather_api/views.py
-import requests
+import asyncio
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
-from .models import CustomUser, LocationHistory, WeatherCache, APIRequestLog
-from .serializers import CustomUserSerializer, WeatherCacheSerializer, LocationHistorySerializer
+from . import city_index, history, response_cache
+from .authentication import CachedTokenAuthentication
+from .compression import negotiate
+from .models import CustomUser, LocationHistory, CellForecast, WeatherCache, APIRequestLog
+from .pagination import PaginationError, decode_cursor, encode_cursor, keyset_page, page_size, parse_time
+from .request_log import log_api_request, weather_summary
+from .serializers import CustomUserSerializer, LocationHistorySerializer
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_CONTENT_TYPES, EXPORT_FORMATS
+from .forecast_codec import parse_selection
+from .geocoding import ageocode, geocode, normalize_city_name
+from .metrics import render as render_metrics, span
+from .grid import grid_cell
+from .refresh import fetch_cities, revalidate_in_background
+from .renderers import dumps
+from .singleflight import acquire_lease, release_lease, weather_lease_key
+from .upstream import FORECAST_VARIABLES, HOURLY_VARIABLES, UpstreamError
 from django.conf import settings
 from django.core.mail import send_mail
 import uuid
 import hashlib
+import hmac
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import check_password
 import json
+import time
 
 
 @api_view(['POST'])
@@ -70,130 +94,670 @@ def registration(request, format=None):
             status=status.HTTP_200_OK,
         )
 
+class WeatherLookupError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def _record_lookup(user, city_name, latitude, longitude, request_url, summary, full_response):
+    # Upsert the user's history entry for this city and trim anything beyond the per-user cap
+    with span('history_write'), transaction.atomic():
+        LocationHistory.objects.bulk_create(
+            [LocationHistory(
+                user=user,
+                city_key=normalize_city_name(city_name),
+                city_name=city_name,
+                latitude=latitude,
+                longitude=longitude,
+                search_time=timezone.now(),
+            )],
+            update_conflicts=True,
+            unique_fields=['user', 'city_key'],
+            update_fields=['city_name', 'latitude', 'longitude', 'search_time'],
+        )
+        overflow = LocationHistory.objects.filter(user=user).order_by('-search_time').values('id')[settings.LOCATION_HISTORY_MAX_ENTRIES:]
+        LocationHistory.objects.filter(user=user, id__in=overflow).delete()
+
+    # Log the API request details (buffered, written in batches off the request thread)
+    log_api_request(user, city_name, request_url, 200, summary, full_response)
+
+def _upstream_summary(lat, lon, weather_response):
+    current = weather_response['current']
+    return weather_summary(lat, lon, current['temperature_2m'], current['relative_humidity_2m'], current['wind_speed_10m'])
+
+def _fetch_weather(city_name):
+    """
+    Store fresh weather data for ``city_name`` in WeatherCache.
+
+    The forecast comes from upstream unless the city's grid cell already has a fresh CellForecast.
+    Returns ``(cache, weather_url, weather_response)``, the last two None when that forecast was
+    reused; raises WeatherLookupError when upstream has no data.
+    """
+    if city_name == '' or len(city_name) > 99:
+        raise WeatherLookupError('City not found', status.HTTP_404_NOT_FOUND)
+
+    # Fetch geo-coordinates for the given city (cached, coordinates never change)
+    coordinates = geocode(city_name)
+    if coordinates is None:
+        raise WeatherLookupError('City not found', status.HTTP_404_NOT_FOUND)
+    lat, lon = coordinates
+
+    # Fetch weather data for the city's grid cell, or reuse the cell's stored forecast
+    city_key = normalize_city_name(city_name)
+    weather_url, fetched = fetch_cities({city_key: (city_name, lat, lon)})
+    if city_key not in fetched:
+        raise WeatherLookupError('Weather data not available', status.HTTP_404_NOT_FOUND)
+
+    cache, weather_response = fetched[city_key]
+    if weather_response is None:
+        return cache, None, None
+    return cache, weather_url, weather_response
+
+def _fresh_cache(city_name):
+    return WeatherCache.objects.filter(city_key=normalize_city_name(city_name), forecast__expiry_time__gt=timezone.now()).first()
+
+def _last_known_cache(city_name):
+    """The city's row however old it is; served when upstream cannot give us a fresh one."""
+    return WeatherCache.objects.filter(city_key=normalize_city_name(city_name)).first()
+
+@span('cache_lookup')
+def _usable_cache(city_name):
+    """The city's row if it is fresh or expired for less than the stale-while-revalidate window."""
+    stale_after = timezone.now() - timezone.timedelta(seconds=settings.WEATHER_STALE_WHILE_REVALIDATE_SECONDS)
+    return WeatherCache.objects.filter(city_key=normalize_city_name(city_name), forecast__expiry_time__gt=stale_after).first()
+
+def _refresh_single_flight(city_name):
+    """
+    Refresh ``city_name`` so that only one worker calls upstream during a burst of misses.
+
+    The worker holding the lease fetches; everyone else waits for its row to appear and,
+    if it takes too long, falls back to the last stale row for the city. The same fallback
+    applies when upstream fails or its circuit breaker is open.
+    Returns ``(cache, weather_url, weather_response)``; the last two are None unless this worker fetched.
+    """
+    lease_key = weather_lease_key(normalize_city_name(city_name))
+    deadline = time.monotonic() + settings.WEATHER_REFRESH_WAIT_SECONDS
+
+    while True:
+        owner = acquire_lease(lease_key, settings.WEATHER_REFRESH_LEASE_SECONDS)
+        if owner:
+            try:
+                # Another worker may have finished between our miss and taking the lease
+                cache = _fresh_cache(city_name)
+                if cache:
+                    return cache, None, None
+                return _fetch_weather(city_name)
+            except UpstreamError:
+                stale = _last_known_cache(city_name)
+                if stale:
+                    return stale, None, None
+                raise WeatherLookupError('Weather service unavailable', status.HTTP_502_BAD_GATEWAY)
+            finally:
+                release_lease(lease_key, owner)
+
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(settings.WEATHER_REFRESH_POLL_SECONDS)
+
+        cache = _fresh_cache(city_name)
+        if cache:
+            return cache, None, None
+
+    # The refreshing worker is still busy, serve the last known data if there is any
+    stale = _last_known_cache(city_name)
+    if stale:
+        return stale, None, None
+    raise WeatherLookupError('Weather data is being refreshed, please retry', status.HTTP_503_SERVICE_UNAVAILABLE)
+
+def _cached_response(request, entry, selection):
+    """
+    The pre-serialized body, or an empty 304 if the client's copy (If-None-Match / If-Modified-Since) is current.
+
+    The body is sent precompressed when the client accepts brotli or gzip.
+
+    The default ``units=metric`` body is the same for every user; only ``units=preferred`` converts
+    it to the user's units, and the ETag covers those units through selection_key(). It is still
+    marked private: the endpoint needs a token and records every lookup in the user's history, so
+    a shared cache must not answer for it. Vary lists Authorization because ``units=preferred``
+    bodies differ per user, and Accept-Encoding because of the precompressed variants.
+    """
+    encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), entry.encoded)
+    # Like GZipMiddleware, compressed variants get a weak ETag; If-None-Match compares weakly anyway
+    etag = f"W/{entry.etag}" if encoding else entry.etag
+    response = get_conditional_response(request, etag=etag, last_modified=entry.last_modified)
+    if response is None:
+        response = HttpResponse(entry.encoded[encoding] if encoding else entry.body, content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(entry.last_modified)
+    expires_at = entry.expires_at
+    if selection.hours is not None:
+        # ?hours= bodies start from the current hour, so they change at the top of every hour
+        expires_at = min(expires_at, (time.time() // 3600 + 1) * 3600)
+    patch_cache_control(response, private=True, max_age=max(0, int(expires_at - time.time())))
+    patch_vary_headers(response, ['Authorization', 'Accept-Encoding'])
+    return response
+
+def _forecast_selection(query_params, user):
+    """Parse the optional ?fields=&hours=&units= response shape; raises ValueError on bad input."""
+    selection = parse_selection(query_params, user)
+    if selection.fields is not None and not set(selection.fields) <= set(HOURLY_VARIABLES):
+        raise ValueError(f"fields must be a comma-separated subset of {FORECAST_VARIABLES}")
+    return selection
+
 @api_view(['GET'])
 def get_weather(request, city_name):
     # Authenticate user (temporarily hardcoded, replace with actual authentication)
     user = request.user
-
-    # Remove all expired cache entries
-    WeatherCache.objects.filter(expiry_time__lt=timezone.now()).delete()
+    city_key = normalize_city_name(city_name)
+    try:
+        selection = _forecast_selection(request.query_params, user)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Serve the pre-serialized response without touching WeatherCache or the serializer
+    entry = response_cache.get(city_key, selection)
+    if entry:
+        if entry.expires_at <= time.time():
+            # Stale but within the window: one background refresh replaces it for every reader
+            revalidate_in_background(city_name)
+        _record_lookup(user, city_name, entry.latitude, entry.longitude, "Cache hit", entry.summary, lambda: json.loads(entry.body))
+        return _cached_response(request, entry, selection)
 
     # Check if valid (non-expired) weather data is cached for this city
-    cache = WeatherCache.objects.filter(city_name=city_name, expiry_time__gt=timezone.now()).first()
+    cache = _usable_cache(city_name)
     
     if cache:
+        if cache.expiry_time <= timezone.now():
+            # Just expired: answer with it now and refresh it off the request path
+            revalidate_in_background(city_name)
         # If cache is valid, return cached data
-        weather_response = WeatherCacheSerializer(cache).data
+        entry = response_cache.store(city_key, cache, selection)
+        _record_lookup(user, city_name, cache.latitude, cache.longitude, "Cache hit", entry.summary, lambda: json.loads(entry.body))
+        return _cached_response(request, entry, selection)
 
-        # Check if location history exists for the user and city
-        location_history = LocationHistory.objects.filter(user=user, city_name=city_name).first()
+    # Cache is either expired or doesn't exist, so we fetch new data (one worker per city)
+    try:
+        cache, weather_url, upstream_response = _refresh_single_flight(city_name)
+    except WeatherLookupError as e:
+        response = Response({'error': e.message}, status=e.status_code)
+        if e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            response['Retry-After'] = '1'
+        return response
 
-        if location_history:
-            # Delete the old location history
-            location_history.delete()
+    # Return from cached
+    entry = response_cache.store(city_key, cache, selection)
 
-        # Create a new location history
-        LocationHistory.objects.create(user=user, city_name=city_name, latitude=weather_response['latitude'], longitude=weather_response['longitude'])
+    if weather_url is None:
+        # Another worker fetched this city for us
+        _record_lookup(user, city_name, cache.latitude, cache.longitude, "Cache hit", entry.summary, lambda: json.loads(entry.body))
+    else:
+        _record_lookup(user, city_name, cache.latitude, cache.longitude, weather_url, _upstream_summary(cache.latitude, cache.longitude, upstream_response), lambda: upstream_response)
 
-        # Log the API request details
-        APIRequestLog.objects.create(
-            user=user,
-            city_name=city_name,
-            request_url="Cache hit",
-            response_status=200,  # Assuming success as the response code
-            response_data=weather_response,
-        )
-        return Response(weather_response)
+    # Return the fetched weather data
+    return _cached_response(request, entry, selection)
+
+def _batch_city_names(request):
+    """
+    The requested cities as {city_key: city_name}, dropping blanks and duplicates but keeping order.
+
+    POST takes a JSON body ``{"cities": [...]}``; GET takes repeated ``?city=``. Either way each name
+    is used whole, so "Paris, FR" stays one city. The older comma-separated ``?cities=`` still works
+    for names without commas. Raises ValueError if the POST body has another shape.
+    """
+    if request.method == 'POST':
+        raw = request.data.get('cities') if isinstance(request.data, dict) else None
+        if not isinstance(raw, list) or not all(isinstance(city_name, str) for city_name in raw):
+            raise ValueError('cities must be a list of city names')
+    else:
+        raw = request.query_params.getlist('city')
+        raw += [city_name for value in request.query_params.getlist('cities') for city_name in value.split(',')]
+
+    city_names = {}
+    for city_name in raw:
+        city_name = ' '.join(city_name.split())
+        if city_name:
+            city_names.setdefault(normalize_city_name(city_name), city_name)
+    return city_names
+
+@api_view(['GET', 'POST'])
+def get_weather_batch(request):
+    """
+    Weather for several cities in one call: ``?city=Tokyo&city=Paris, FR&...``, or POST ``{"cities": [...]}``.
+
+    Cached cities are resolved with a single WeatherCache query and everything else is fetched
+    from Open-Meteo in one multi-coordinate request, one location per grid cell. Like get_weather, a city
+    is only fetched under its single-flight lease; cities another worker is fetching are waited for.
+    ``results`` follows the request order and holds either the usual get_weather object or
+    ``{"city_name": ..., "error": ...}``.
+    """
+    user = request.user
+    try:
+        selection = _forecast_selection(request.query_params, user)
+        city_names = _batch_city_names(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not city_names:
+        return Response({'error': 'cities is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(city_names) > settings.WEATHER_BATCH_MAX_CITIES:
+        return Response({'error': f'At most {settings.WEATHER_BATCH_MAX_CITIES} cities per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+    entries = {}
+    errors = {}
+
+    # Pre-serialized responses first, then every remaining fresh row in one query
+    for city_key, city_name in city_names.items():
+        entry = response_cache.get(city_key, selection)
+        # Unlike get_weather, the batch refetches stale cities instead of serving them
+        if entry and entry.expires_at > time.time():
+            entries[city_key] = entry
+    missing = [city_key for city_key in city_names if city_key not in entries]
+    for cache in WeatherCache.objects.filter(city_key__in=missing, forecast__expiry_time__gt=timezone.now()):
+        entries[cache.city_key] = response_cache.store(cache.city_key, cache, selection)
+    for city_key, entry in entries.items():
+        _record_lookup(user, city_names[city_key], entry.latitude, entry.longitude, "Cache hit", entry.summary, lambda entry=entry: json.loads(entry.body))
+
+    # Geocode the misses (usually from the geocode cache) and fetch them all at once
+    coordinates = {}
+    for city_key in city_names:
+        if city_key in entries:
+            continue
+        city_name = city_names[city_key]
+        try:
+            found = geocode(city_name) if len(city_name) <= 99 else None
+        except UpstreamError:
+            errors[city_key] = 'Weather service unavailable'
+            continue
+        if found is None:
+            errors[city_key] = 'City not found'
+        else:
+            coordinates[city_key] = found
+
+    def serve_row(cache):
+        entry = entries[cache.city_key] = response_cache.store(cache.city_key, cache, selection)
+        _record_lookup(user, city_names[cache.city_key], cache.latitude, cache.longitude, "Cache hit", entry.summary, lambda: json.loads(entry.body))
+
+    # One worker per city calls upstream, as in _refresh_single_flight(): fetch the cities whose
+    # lease we get, wait for whoever holds the others
+    leases = {}
+    busy = []
+    for city_key in coordinates:
+        owner = acquire_lease(weather_lease_key(city_key), settings.WEATHER_REFRESH_LEASE_SECONDS)
+        if owner:
+            leases[city_key] = owner
+        else:
+            busy.append(city_key)
+    try:
+        # Another worker may have finished some of them between our miss and taking the lease
+        for cache in WeatherCache.objects.filter(city_key__in=list(leases), forecast__expiry_time__gt=timezone.now()):
+            serve_row(cache)
+        to_fetch = [city_key for city_key in leases if city_key not in entries]
+        if to_fetch:
+            try:
+                weather_url, fetched = fetch_cities({city_key: (city_names[city_key], *coordinates[city_key]) for city_key in to_fetch})
+            except UpstreamError:
+                weather_url, fetched = None, {}
+                errors.update(dict.fromkeys(to_fetch, 'Weather service unavailable'))
+
+            for city_key, (cache, weather_response) in fetched.items():
+                if weather_response is None:
+                    # Reused the stored forecast of the city's grid cell
+                    serve_row(cache)
+                else:
+                    entries[city_key] = response_cache.store(city_key, cache, selection)
+                    summary = _upstream_summary(cache.latitude, cache.longitude, weather_response)
+                    _record_lookup(user, city_names[city_key], cache.latitude, cache.longitude, weather_url, summary, lambda weather_response=weather_response: weather_response)
+    finally:
+        for city_key, owner in leases.items():
+            release_lease(weather_lease_key(city_key), owner)
+
+    deadline = time.monotonic() + settings.WEATHER_REFRESH_WAIT_SECONDS
+    while busy:
+        for cache in WeatherCache.objects.filter(city_key__in=busy, forecast__expiry_time__gt=timezone.now()):
+            serve_row(cache)
+        busy = [city_key for city_key in busy if city_key not in entries]
+        if not busy or time.monotonic() >= deadline:
+            break
+        time.sleep(settings.WEATHER_REFRESH_POLL_SECONDS)
+    errors.update(dict.fromkeys(busy, 'Weather data is being refreshed, please retry'))
+
+    # Cities upstream could not serve, or still being refreshed elsewhere, fall back to their last known row
+    unavailable = [city_key for city_key, error in errors.items() if error != 'City not found']
+    for cache in WeatherCache.objects.filter(city_key__in=unavailable):
+        serve_row(cache)
+
+    # Splice the cached bodies together instead of decoding and re-rendering them
+    parts = []
+    for city_key, city_name in city_names.items():
+        if city_key in entries:
+            parts.append(entries[city_key].body)
+        else:
+            parts.append(dumps({'city_name': city_name, 'error': errors.get(city_key, 'Weather data not available')}))
+    return HttpResponse(b'{"results":[' + b','.join(parts) + b']}', content_type='application/json')
+
+def _json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), status=status_code, content_type='application/json')
+
+async def _afresh_cache(city_name):
+    return await WeatherCache.objects.filter(city_key=normalize_city_name(city_name), forecast__expiry_time__gt=timezone.now()).afirst()
+
+async def _alast_known_cache(city_name):
+    return await WeatherCache.objects.filter(city_key=normalize_city_name(city_name)).afirst()
+
+async def _ausable_cache(city_name):
+    stale_after = timezone.now() - timezone.timedelta(seconds=settings.WEATHER_STALE_WHILE_REVALIDATE_SECONDS)
+    with span('cache_lookup'):
+        return await WeatherCache.objects.filter(city_key=normalize_city_name(city_name), forecast__expiry_time__gt=stale_after).afirst()
+
+async def _arefresh_single_flight(city_name, coordinates):
+    """Async counterpart of _refresh_single_flight(); the fetch itself runs fetch_cities() in a worker thread."""
+    lease_key = weather_lease_key(normalize_city_name(city_name))
+    deadline = time.monotonic() + settings.WEATHER_REFRESH_WAIT_SECONDS
+
+    while True:
+        owner = await sync_to_async(acquire_lease)(lease_key, settings.WEATHER_REFRESH_LEASE_SECONDS)
+        if owner:
+            try:
+                cache = await _afresh_cache(city_name)
+                if cache:
+                    return cache, None, None
+                # Same grid-cell reuse, history and upsert as _fetch_weather()
+                city_key = normalize_city_name(city_name)
+                weather_url, fetched = await sync_to_async(fetch_cities)({city_key: (city_name, *coordinates)})
+                if city_key not in fetched:
+                    raise WeatherLookupError('Weather data not available', status.HTTP_404_NOT_FOUND)
+                cache, weather_response = fetched[city_key]
+                if weather_response is None:
+                    return cache, None, None
+                return cache, weather_url, weather_response
+            except UpstreamError:
+                stale = await _alast_known_cache(city_name)
+                if stale:
+                    return stale, None, None
+                raise WeatherLookupError('Weather service unavailable', status.HTTP_502_BAD_GATEWAY)
+            finally:
+                await sync_to_async(release_lease)(lease_key, owner)
+
+        if time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(settings.WEATHER_REFRESH_POLL_SECONDS)
+
+        cache = await _afresh_cache(city_name)
+        if cache:
+            return cache, None, None
+
+    stale = await _alast_known_cache(city_name)
+    if stale:
+        return stale, None, None
+    raise WeatherLookupError('Weather data is being refreshed, please retry', status.HTTP_503_SERVICE_UNAVAILABLE)
+
+async def get_weather_async(request, city_name):
+    """
+    Same contract as get_weather, for the ASGI deployment.
+
+    Cache hits never geocode. Geocoding goes through a shared keep-alive httpx pool, so a slow
+    upstream only parks a coroutine; a miss then fetches through the same fetch_cities() as the
+    sync and batch views.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
 
-    # Cache is either expired or doesn't exist, so we fetch new data
-    # Fetch geo-coordinates for the given city
-    geo_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city_name}&appid={settings.OPENWEATHER_API_KEY}".replace(' ', '%20')
-    geo_response = requests.get(geo_url).json()
+    try:
+        auth = await sync_to_async(CachedTokenAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        return _json_response({'detail': e.detail}, status.HTTP_401_UNAUTHORIZED)
+    if auth is None:
+        return _json_response({'detail': 'Authentication credentials were not provided.'}, status.HTTP_401_UNAUTHORIZED)
+    user = auth[0]
 
-    if not geo_response or city_name == '' or len(city_name) > 99:
-        return Response({'error': 'City not found'}, status=status.HTTP_404_NOT_FOUND)
+    if city_name == '' or len(city_name) > 99:
+        return _json_response({'error': 'City not found'}, status.HTTP_404_NOT_FOUND)
 
-    # Use the last result's latitude and longitude
-    lat, lon = geo_response[-1]['lat'], geo_response[-1]['lon']
+    city_key = normalize_city_name(city_name)
+    try:
+        # ?units=preferred reads the unit preferences, which the authenticated user has not loaded yet
+        selection = await sync_to_async(_forecast_selection)(request.GET, user)
+    except ValueError as e:
+        return _json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+    entry = await response_cache.aget(city_key, selection)
+    if entry:
+        if entry.expires_at <= time.time():
+            revalidate_in_background(city_name)
+        await sync_to_async(_record_lookup)(user, city_name, entry.latitude, entry.longitude, "Cache hit", entry.summary, lambda: json.loads(entry.body))
+        return _cached_response(request, entry, selection)
+
+    cache = await _ausable_cache(city_name)
+    if cache:
+        if cache.expiry_time <= timezone.now():
+            revalidate_in_background(city_name)
+        entry = await response_cache.astore(city_key, cache, selection)
+        await sync_to_async(_record_lookup)(user, city_name, cache.latitude, cache.longitude, "Cache hit", entry.summary, lambda: json.loads(entry.body))
+        return _cached_response(request, entry, selection)
 
-    # Fetch weather data using the latitude and longitude
-    weather_url = (
-        "https://api.open-meteo.com/v1/forecast?"
-        f"latitude={lat}&"
-        f"longitude={lon}&"
-        "current=temperature_2m,relative_humidity_2m,wind_speed_10m,dew_point_2m,precipitation_probability,surface_pressure,wind_speed_10m,wind_direction_10m&"
-        "hourly=temperature_2m,relative_humidity_2m,wind_speed_10m,dew_point_2m,precipitation_probability,surface_pressure,wind_speed_10m,wind_direction_10m"
-    )
-    weather_response = requests.get(weather_url).json()
-
-    if 'current' not in weather_response:
-        return Response({'error': 'Weather data not available'}, status=status.HTTP_404_NOT_FOUND)
-
-    # Save new weather data to cache with an expiry time of 1 hour
-    WeatherCache.objects.create(
-        city_name=city_name,
-        latitude=lat,
-        longitude=lon,
-        temperature=weather_response['current']['temperature_2m'],
-        humidity=weather_response['current']['relative_humidity_2m'],
-        wind_speed=weather_response['current']['wind_speed_10m'],
-        forecast_data=weather_response['hourly'],
-        expiry_time=timezone.now() + timezone.timedelta(hours=1),
-    )
+    # Only a miss needs the coordinates, usually from the geocode cache
+    try:
+        coordinates = await ageocode(city_name)
+    except UpstreamError:
+        cache = await _alast_known_cache(city_name)
+        if cache is None:
+            return _json_response({'error': 'Weather service unavailable'}, status.HTTP_502_BAD_GATEWAY)
+        entry = await response_cache.astore(city_key, cache, selection)
+        await sync_to_async(_record_lookup)(user, city_name, cache.latitude, cache.longitude, "Cache hit", entry.summary, lambda: json.loads(entry.body))
+        return _cached_response(request, entry, selection)
+    if coordinates is None:
+        return _json_response({'error': 'City not found'}, status.HTTP_404_NOT_FOUND)
 
-    # Check if location history exists for the user and city
-    location_history = LocationHistory.objects.filter(user=user, city_name=city_name).first()
+    try:
+        cache, weather_url, upstream_response = await _arefresh_single_flight(city_name, coordinates)
+    except WeatherLookupError as e:
+        response = _json_response({'error': e.message}, e.status_code)
+        if e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            response['Retry-After'] = '1'
+        return response
+
+    entry = await response_cache.astore(city_key, cache, selection)
+    if weather_url is None:
+        await sync_to_async(_record_lookup)(user, city_name, cache.latitude, cache.longitude, "Cache hit", entry.summary, lambda: json.loads(entry.body))
+    else:
+        await sync_to_async(_record_lookup)(user, city_name, cache.latitude, cache.longitude, weather_url, _upstream_summary(cache.latitude, cache.longitude, upstream_response), lambda: upstream_response)
+    return _cached_response(request, entry, selection)
 
-    if location_history:
-        # Delete the old location history
-        location_history.delete()
+def _history_params(query_params):
+    """Parse ``?days=&bucket=&fields=&percentiles=`` for get_weather_history; raises ValueError on bad input."""
+    try:
+        days = int(query_params.get('days', 30))
+    except ValueError:
+        raise ValueError('days must be an integer')
+    if not 1 <= days <= settings.WEATHER_HISTORY_RETENTION_DAYS:
+        raise ValueError(f'days must be between 1 and {settings.WEATHER_HISTORY_RETENTION_DAYS}')
 
-    # Create a new location history
-    LocationHistory.objects.create(user=user, city_name=city_name, latitude=lat, longitude=lon)
-    
-    # Log the API request details
-    APIRequestLog.objects.create(
-        user=user,
-        city_name=city_name,
-        request_url=weather_url,
-        response_status=200,  # Assuming success as the response code
-        response_data=weather_response,
-    )
+    bucket = query_params.get('bucket', 'day')
+    if bucket not in history.BUCKET_SECONDS:
+        raise ValueError(f"bucket must be one of {', '.join(history.BUCKET_SECONDS)}")
 
-    # Return from cached
-    cache = WeatherCache.objects.filter(city_name=city_name, expiry_time__gt=timezone.now()).first()
-    weather_response = WeatherCacheSerializer(cache).data
+    fields = query_params.get('fields')
+    fields = fields.split(',') if fields else list(HOURLY_VARIABLES)
+    if not set(fields) <= set(HOURLY_VARIABLES):
+        raise ValueError(f"fields must be a comma-separated subset of {FORECAST_VARIABLES}")
 
-    # Return the fetched weather data
-    return Response(weather_response)
+    try:
+        percentiles = [float(value) for value in query_params.get('percentiles', '50,90').split(',') if value]
+    except ValueError:
+        raise ValueError('percentiles must be comma-separated numbers')
+    if len(percentiles) > 5 or not all(0 <= value <= 100 for value in percentiles):
+        raise ValueError('percentiles takes up to 5 values between 0 and 100')
+    return days, bucket, fields, percentiles
+
+@api_view(['GET'])
+def get_weather_history(request, city_name):
+    """
+    Hourly weather history of a city aggregated per day or week.
+
+    ``?days=90&bucket=day|week&fields=temperature_2m,...&percentiles=50,90``. Each result holds the
+    bucket start (UTC), the number of hours recorded and min/max/mean/percentiles per field. History
+    is kept per grid cell, so nearby cities share it.
+    """
+    try:
+        days, bucket, fields, percentiles = _history_params(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if city_name == '' or len(city_name) > 99:
+        return Response({'error': 'City not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        coordinates = geocode(city_name)
+    except UpstreamError:
+        return Response({'error': 'Weather service unavailable'}, status=status.HTTP_502_BAD_GATEWAY)
+    if coordinates is None:
+        return Response({'error': 'City not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    end = timezone.now()
+    start = end - timezone.timedelta(days=days)
+    with span('history_query'):
+        epochs, columns = history.load(grid_cell(*coordinates), start, end, fields)
+        results = history.aggregate(epochs, columns, bucket, percentiles)
+    return Response({
+        'city_name': city_name,
+        'bucket': bucket,
+        'start': start,
+        'end': end,
+        'results': results,
+    })
+
+@api_view(['GET'])
+def suggest_cities(request):
+    """
+    City names starting with, or close to, ``?q=`` (``&limit=``, default 10).
+
+    Answered from this worker's in-memory index of the bundled gazetteer and every city resolved
+    so far, so picking a suggestion keeps /weather/ lookups on names that are known to geocode.
+    """
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), settings.CITY_SUGGEST_MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    suggestions = city_index.get_index().suggest(query[:100], limit) if query.strip() else []
+    return Response({
+        'query': query,
+        'suggestions': [{'name': name, 'country': country or None} for name, country in suggestions],
+    })
 
 @api_view(['DELETE'])
 @permission_classes([IsAdminUser])
 def delete_all_cache(request):
-    WeatherCache.objects.all().delete()
+    city_keys = list(WeatherCache.objects.values_list('city_key', flat=True))
+    # City rows go with their cell forecasts
+    CellForecast.objects.all().delete()
+    response_cache.invalidate(*city_keys)
 
     return Response({'message': 'Cache cleared'})
 
 @api_view(['DELETE'])
 @permission_classes([IsAdminUser])
 def delete_all_city_cache(request, city_name):
-    WeatherCache.objects.filter(city_name=city_name).delete()
+    city_key = normalize_city_name(city_name)
+    # The forecast is shared by the whole grid cell, so clearing it clears the cell's other cities too
+    cell_keys = WeatherCache.objects.filter(city_key=city_key).values('forecast_id')
+    city_keys = list(WeatherCache.objects.filter(forecast_id__in=cell_keys).values_list('city_key', flat=True))
+    CellForecast.objects.filter(cell_key__in=cell_keys).delete()
+    response_cache.invalidate(city_key, *city_keys)
 
     return Response({'message': f'Cache for {city_name} cleared'})
 
-# View to get the API logs
+def _filter_api_logs(request, api_logs):
+    """Apply the admin log filters (status, city, user, since, until) from the query string."""
+    since = parse_time(request, 'since')
+    until = parse_time(request, 'until')
+    if 'status' in request.query_params:
+        try:
+            api_logs = api_logs.filter(response_status=int(request.query_params['status']))
+        except ValueError:
+            raise ValueError('status must be an integer')
+    if 'city' in request.query_params:
+        api_logs = api_logs.filter(city_name=request.query_params['city'])
+    if 'user' in request.query_params:
+        api_logs = api_logs.filter(user__email=request.query_params['user'])
+    if since:
+        api_logs = api_logs.filter(request_time__gte=since)
+    if until:
+        api_logs = api_logs.filter(request_time__lt=until)
+    return api_logs
+
+# View to get the API logs, newest first, one keyset page at a time
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def get_api_logs(request):
-    api_logs = APIRequestLog.objects.all().order_by('-request_time')
-    return Response([{
-        'id': log.id,
-        'user': log.user.email if log.user else "Anonymous",
-        'city_name': log.city_name,
-        'request_time': log.request_time,
-        'request_url': log.request_url,
-        'response_status': log.response_status,
-    } for log in api_logs])
+    try:
+        limit = page_size(request)
+        api_logs = _filter_api_logs(request, (
+            APIRequestLog.objects
+            .select_related('user')
+            .only('id', 'city_name', 'request_time', 'request_url', 'response_status', 'user__email')
+            .order_by('-request_time', '-id')
+        ))
+        if 'cursor' in request.query_params:
+            try:
+                request_time, log_id = decode_cursor(request.query_params['cursor'])
+                request_time, log_id = parse_datetime(request_time), int(log_id)
+            except (TypeError, ValueError):
+                raise PaginationError("Invalid cursor")
+            if request_time is None:
+                raise PaginationError("Invalid cursor")
+            api_logs = api_logs.filter(Q(request_time__lt=request_time) | Q(request_time=request_time, id__lt=log_id))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    logs, last = keyset_page(api_logs, limit)
+    return Response({
+        'results': [{
+            'id': log.id,
+            'user': log.user.email if log.user else "Anonymous",
+            'city_name': log.city_name,
+            'request_time': log.request_time,
+            'request_url': log.request_url,
+            'response_status': log.response_status,
+        } for log in logs],
+        'next_cursor': encode_cursor(last.request_time.isoformat(), last.id) if last else None,
+    })
+
+API_LOG_EXPORT_FIELDS = ['id', 'user__email', 'city_name', 'request_time', 'request_url', 'response_status']
+SEARCH_HISTORY_EXPORT_FIELDS = ['id', 'user__email', 'city_name', 'latitude', 'longitude', 'search_time']
+
+def _export_response(rows, fields, export_format, filename):
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': 'Export format must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+    # Related lookups such as "user__email" are exported under the relation name
+    columns = [field.split('__')[0] for field in fields]
+    response = StreamingHttpResponse(EXPORT_FORMATS[export_format](rows, columns), content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+# Stream every (filtered) API log row as CSV or NDJSON through a server-side cursor
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_api_logs(request, export_format):
+    try:
+        api_logs = _filter_api_logs(request, APIRequestLog.objects.order_by('request_time', 'id'))
+    except (PaginationError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    rows = api_logs.values_list(*API_LOG_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return _export_response(rows, API_LOG_EXPORT_FIELDS, export_format, 'api-logs')
+
+# Stream the search history of every user as CSV or NDJSON
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_search_history(request, export_format):
+    rows = (
+        LocationHistory.objects.order_by('search_time', 'id')
+        .values_list(*SEARCH_HISTORY_EXPORT_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return _export_response(rows, SEARCH_HISTORY_EXPORT_FIELDS, export_format, 'search-history')
 
 @api_view(['GET'])
 def get_user_search_history(request):
@@ -203,6 +767,12 @@ def get_user_search_history(request):
     serializer = LocationHistorySerializer(search_history, many=True)
     return Response(serializer.data)
 
+@api_view(['POST'])
+def logout(request):
+    # Deleting the token revokes it everywhere; the next login issues a new one
+    request.auth.delete()
+    return Response({"success": True, "message": "Logged out successfully."}, status=status.HTTP_200_OK)
+
 @api_view(['DELETE'])
 def delete_user_account(request):
     user = request.user
@@ -227,7 +797,8 @@ def delete_search_history(request, id):
 
 @api_view(['GET', 'PATCH', 'PUT'])
 def user_info(request):
-    user = request.user
+    # request.user only has its id loaded (see CachedTokenAuthentication); read the current row
+    user = CustomUser.objects.get(pk=request.user.pk)
 
     # Handle GET request to retrieve user information
     if request.method == 'GET':
@@ -268,17 +839,34 @@ def user_info(request):
         updated_serializer = CustomUserSerializer(user)
         return Response(updated_serializer.data, status=status.HTTP_200_OK)
 
-# Admin View to GET list of all users
+# Admin View to GET list of all users, one keyset page at a time
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def list_all_users(request):
-    # Get all users
-    users = CustomUser.objects.all()
-    
+    users = CustomUser.objects.only(
+        'id', 'email', 'display_name', 'preferred_temperature_unit', 'preferred_wind_speed_unit',
+    ).order_by('id')
+    try:
+        limit = page_size(request)
+        if 'cursor' in request.query_params:
+            try:
+                (last_id,) = decode_cursor(request.query_params['cursor'])
+                last_id = int(last_id)
+            except (TypeError, ValueError):
+                raise PaginationError("Invalid cursor")
+            users = users.filter(id__gt=last_id)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    users, last = keyset_page(users, limit)
+
     # Serialize the user data
     serializer = CustomUserSerializer(users, many=True)
     
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response({
+        'results': serializer.data,
+        'next_cursor': encode_cursor(last.id) if last else None,
+    }, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 def roles(request):
@@ -286,3 +874,14 @@ def roles(request):
         return Response({"role": "admin"}, status=status.HTTP_200_OK)
     else:
         return Response({"role": "user"}, status=status.HTTP_200_OK)
+
+def metrics(request):
+    """Prometheus scrape target. Plain Django view so scrapes skip DRF authentication and content negotiation."""
+    # Closed unless a scrape token is configured: the metrics expose per-view traffic and upstream hosts
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {settings.METRICS_TOKEN}"):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,77 @@
+# weather_api/weather_store.py
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .forecast_codec import encode_hourly
+from .geocoding import normalize_city_name
+from .grid import grid_cell
+from .metrics import span
+from .models import CellForecast, WeatherCache
+
+CELL_FORECAST_UPSERT_FIELDS = ['temperature', 'humidity', 'wind_speed', 'forecast_blob', 'cached_at', 'expiry_time']
+WEATHER_CACHE_UPSERT_FIELDS = ['city_name', 'latitude', 'longitude', 'forecast']
+
+
+def has_weather(weather_response):
+    return isinstance(weather_response, dict) and 'current' in weather_response and 'hourly' in weather_response
+
+
+def cell_forecast(cell_key, weather_response):
+    """Build an unsaved CellForecast from an Open-Meteo response, expiring after WEATHER_CACHE_TTL_SECONDS."""
+    now = timezone.now()
+    return CellForecast(
+        cell_key=cell_key,
+        temperature=weather_response['current']['temperature_2m'],
+        humidity=weather_response['current']['relative_humidity_2m'],
+        wind_speed=weather_response['current']['wind_speed_10m'],
+        forecast_blob=encode_hourly(weather_response['hourly']),
+        cached_at=now,
+        expiry_time=now + timezone.timedelta(seconds=settings.WEATHER_CACHE_TTL_SECONDS),
+    )
+
+
+def city_row(city_name, lat, lon, forecast):
+    """Unsaved WeatherCache row mapping ``city_name`` onto ``forecast``, the CellForecast of its grid cell."""
+    return WeatherCache(
+        city_key=normalize_city_name(city_name),
+        city_name=city_name,
+        latitude=lat,
+        longitude=lon,
+        forecast=forecast,
+    )
+
+
+def weather_row(city_name, lat, lon, weather_response):
+    """Unsaved WeatherCache row, and its unsaved CellForecast, built from an Open-Meteo response."""
+    return city_row(city_name, lat, lon, cell_forecast(grid_cell(lat, lon), weather_response))
+
+
+def fresh_cell_forecasts(cell_keys, fresh_until=None):
+    """{cell_key: forecast} for the cells whose CellForecast is still valid at ``fresh_until`` (default now)."""
+    forecasts = CellForecast.objects.filter(cell_key__in=list(cell_keys), expiry_time__gt=fresh_until or timezone.now())
+    return {forecast.cell_key: forecast for forecast in forecasts}
+
+
+@span('cache_write')
+def upsert_weather(forecasts, rows):
+    """
+    Insert or replace ``forecasts`` by cell, then the city ``rows`` pointing at them, one INSERT ... ON CONFLICT each.
+
+    Every city in a cell reads the same forecast row, so a refresh writes one forecast per cell and
+    only small city rows per name.
+    """
+    with transaction.atomic():
+        if forecasts:
+            CellForecast.objects.bulk_create(
+                forecasts,
+                update_conflicts=True,
+                unique_fields=['cell_key'],
+                update_fields=CELL_FORECAST_UPSERT_FIELDS,
+            )
+        if rows:
+            WeatherCache.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['city_key'],
+                update_fields=WEATHER_CACHE_UPSERT_FIELDS,
+            )
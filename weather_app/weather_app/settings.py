@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+from urllib.parse import urlsplit
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,8 +47,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'weather_api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Cached weather responses are precompressed (brotli/gzip) and pass through untouched
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -90,6 +94,12 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
         'HOST': os.environ.get('POSTGRES_HOST'),
         'PORT': os.environ.get('POSTGRES_PORT'),
+        # Keep each worker's connection open between requests instead of reconnecting every time,
+        # and check it is still alive before reusing it after an idle period
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes'),
+        # Required behind pgbouncer in transaction pooling mode, where a named cursor may land on another server connection
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 'false').lower() in ('1', 'true', 'yes'),
     }
 }
 
@@ -140,11 +150,20 @@ AUTH_USER_MODEL = 'weather_api.CustomUser'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-               'rest_framework.authentication.TokenAuthentication',
+               'weather_api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES':(
                 'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+                'weather_api.renderers.ORJSONRenderer',
+                'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+                'weather_api.renderers.ORJSONParser',
+                'rest_framework.parsers.FormParser',
+                'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -157,6 +176,118 @@ SPECTACULAR_SETTINGS = {
 OPENWEATHER_API_KEY = os.environ.get('OPENWEATHER_API_KEY')
 BACKEND_URL = os.environ.get('BACKEND_URL')
 
+# Shared cache tier: Redis when REDIS_URL is set, otherwise per-process memory
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Pre-serialized weather responses: per-worker LRU in front of the shared cache above
+RESPONSE_CACHE_ALIAS = os.environ.get('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_LOCAL_SIZE = int(os.environ.get('RESPONSE_CACHE_LOCAL_SIZE', 1024))
+RESPONSE_CACHE_LOCAL_TTL = float(os.environ.get('RESPONSE_CACHE_LOCAL_TTL', 30))
+
+# Resolved API tokens: per-worker LRU in front of the shared cache. The local TTL bounds how long
+# another worker may still accept a token after logout.
+AUTH_TOKEN_CACHE_ALIAS = os.environ.get('AUTH_TOKEN_CACHE_ALIAS', 'default')
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 5 * 60))
+AUTH_TOKEN_CACHE_LOCAL_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_LOCAL_SIZE', 4096))
+AUTH_TOKEN_CACHE_LOCAL_TTL = float(os.environ.get('AUTH_TOKEN_CACHE_LOCAL_TTL', 5))
+
+# Most cities accepted by one /weather-batch/ request
+WEATHER_BATCH_MAX_CITIES = int(os.environ.get('WEATHER_BATCH_MAX_CITIES', 20))
+
+# Single-flight refresh: one worker per city fetches upstream, the rest wait for its result
+WEATHER_REFRESH_LEASE_SECONDS = int(os.environ.get('WEATHER_REFRESH_LEASE_SECONDS', 30))
+WEATHER_REFRESH_WAIT_SECONDS = float(os.environ.get('WEATHER_REFRESH_WAIT_SECONDS', 10))
+WEATHER_REFRESH_POLL_SECONDS = float(os.environ.get('WEATHER_REFRESH_POLL_SECONDS', 0.1))
+
+# WeatherCache freshness. A row expired for less than the stale-while-revalidate window is still
+# served while one worker refreshes it in the background.
+WEATHER_CACHE_TTL_SECONDS = int(os.environ.get('WEATHER_CACHE_TTL_SECONDS', 60 * 60))
+WEATHER_STALE_WHILE_REVALIDATE_SECONDS = int(os.environ.get('WEATHER_STALE_WHILE_REVALIDATE_SECONDS', 5 * 60))
+
+# Size in degrees of the lat/lon grid cells forecasts are cached by (0.1 is about 11 km); every
+# city geocoded into the same cell shares one upstream fetch and one stored CellForecast row
+WEATHER_GRID_DEGREES = float(os.environ.get('WEATHER_GRID_DEGREES', 0.1))
+
+# Refresh-ahead (refresh_hot_cities): the most requested cities are re-fetched shortly before they expire
+REFRESH_AHEAD_TOP_K = int(os.environ.get('REFRESH_AHEAD_TOP_K', 50))
+REFRESH_AHEAD_LEAD_SECONDS = int(os.environ.get('REFRESH_AHEAD_LEAD_SECONDS', 10 * 60))
+REFRESH_AHEAD_POPULARITY_HOURS = int(os.environ.get('REFRESH_AHEAD_POPULARITY_HOURS', 24))
+# The popularity ranking scans the request log, so a looping job recomputes it only this often
+REFRESH_AHEAD_RANKING_SECONDS = int(os.environ.get('REFRESH_AHEAD_RANKING_SECONDS', 15 * 60))
+REFRESH_AHEAD_BATCH_SIZE = int(os.environ.get('REFRESH_AHEAD_BATCH_SIZE', 20))
+REFRESH_AHEAD_MAX_JITTER_SECONDS = float(os.environ.get('REFRESH_AHEAD_MAX_JITTER_SECONDS', 5))
+
+# Hourly WeatherObservation history is kept this many days (also the longest range /history/ accepts)
+WEATHER_HISTORY_RETENTION_DAYS = int(os.environ.get('WEATHER_HISTORY_RETENTION_DAYS', 400))
+
+# Expired WeatherCache rows are kept this long as a stale fallback before the sweeper purges them
+WEATHER_CACHE_RETENTION_SECONDS = int(os.environ.get('WEATHER_CACHE_RETENTION_SECONDS', 24 * 60 * 60))
+
+# APIRequestLog writes: buffered and bulk-inserted from a background thread.
+# API_LOG_PAYLOAD_MODE is "none", "summary" (current conditions only) or "full" (whole upstream/response body)
+API_LOG_BUFFERED = os.environ.get('API_LOG_BUFFERED', '1') == '1'
+API_LOG_PAYLOAD_MODE = os.environ.get('API_LOG_PAYLOAD_MODE', 'summary')
+API_LOG_BATCH_SIZE = int(os.environ.get('API_LOG_BATCH_SIZE', 200))
+API_LOG_FLUSH_SECONDS = float(os.environ.get('API_LOG_FLUSH_SECONDS', 2))
+API_LOG_MAX_PENDING = int(os.environ.get('API_LOG_MAX_PENDING', 10000))
+
+# APIRequestLog retention: partitions older than this are dropped by manage_api_log_partitions
+API_LOG_PARTITION_INTERVAL = os.environ.get('API_LOG_PARTITION_INTERVAL', 'month')
+API_LOG_RETENTION_DAYS = int(os.environ.get('API_LOG_RETENTION_DAYS', 180))
+
+# Most recent distinct cities kept in each user's search history
+LOCATION_HISTORY_MAX_ENTRIES = int(os.environ.get('LOCATION_HISTORY_MAX_ENTRIES', 50))
+
+# Upstream endpoints; point both at `manage.py fake_upstream` to benchmark without the real APIs
+GEOCODE_URL = os.environ.get('GEOCODE_URL', 'http://api.openweathermap.org/geo/1.0/direct')
+FORECAST_URL = os.environ.get('FORECAST_URL', 'https://api.open-meteo.com/v1/forecast')
+
+# Upstream HTTP clients: keep-alive pool size and per-host timeouts in seconds
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 20))
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 3.05))
+UPSTREAM_DEFAULT_READ_TIMEOUT = float(os.environ.get('UPSTREAM_DEFAULT_READ_TIMEOUT', 10))
+UPSTREAM_READ_TIMEOUTS = {
+    urlsplit(GEOCODE_URL).hostname: float(os.environ.get('GEOCODE_READ_TIMEOUT', 5)),
+    urlsplit(FORECAST_URL).hostname: float(os.environ.get('FORECAST_READ_TIMEOUT', 10)),
+}
+
+# Upstream retries (connection errors, 5xx, non-JSON replies) with jittered exponential backoff, and a
+# per-host circuit breaker that fails fast after UPSTREAM_BREAKER_FAILURES consecutive failures
+UPSTREAM_MAX_RETRIES = int(os.environ.get('UPSTREAM_MAX_RETRIES', 2))
+UPSTREAM_RETRY_BACKOFF_SECONDS = float(os.environ.get('UPSTREAM_RETRY_BACKOFF_SECONDS', 0.2))
+UPSTREAM_BREAKER_FAILURES = int(os.environ.get('UPSTREAM_BREAKER_FAILURES', 5))
+UPSTREAM_BREAKER_RESET_SECONDS = float(os.environ.get('UPSTREAM_BREAKER_RESET_SECONDS', 30))
+
+# Prometheus metrics at /api/metrics, which requires "Authorization: Bearer <METRICS_TOKEN>" and answers
+# 404 while METRICS_TOKEN is unset. METRICS_MULTIPROC_DIR sums the metrics of all gunicorn workers on every scrape.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+
+# Per-worker LRU in front of the GeocodeCache table
+GEOCODE_LRU_SIZE = int(os.environ.get('GEOCODE_LRU_SIZE', 4096))
+# Names OpenWeatherMap could not geocode are remembered (per worker and in this cache alias) for this long
+GEOCODE_NEGATIVE_CACHE_ALIAS = os.environ.get('GEOCODE_NEGATIVE_CACHE_ALIAS', 'default')
+GEOCODE_NEGATIVE_TTL = int(os.environ.get('GEOCODE_NEGATIVE_TTL', 24 * 60 * 60))
+
+# /cities/suggest: per-worker index of the bundled gazetteer plus every geocoded city, rebuilt periodically
+CITY_GAZETTEER_PATH = os.environ.get('CITY_GAZETTEER_PATH', BASE_DIR / 'weather_api' / 'data' / 'cities.csv')
+CITY_INDEX_REFRESH_SECONDS = int(os.environ.get('CITY_INDEX_REFRESH_SECONDS', 10 * 60))
+CITY_SUGGEST_MAX_LIMIT = int(os.environ.get('CITY_SUGGEST_MAX_LIMIT', 25))
+
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS').split(" ")
 
 CORS_ALLOW_CREDENTIALS = True
@@ -1,6 +1,6 @@
 "use client";
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import axios from 'axios';
 import { useRouter } from 'next/navigation';
 import { Bar, Pie } from 'react-chartjs-2';
@@ -29,6 +29,8 @@ ChartJS.register(
 const AdminDashboard: React.FC = () => {
   const [role, setRole] = useState<string | null>(null);
   const [apiLogs, setApiLogs] = useState<any[]>([]);
+  const [logsCursor, setLogsCursor] = useState<string | null>(null);
+  const [loadingLogs, setLoadingLogs] = useState(false);
   const [users, setUsers] = useState<any[]>([]);
   const [error, setError] = useState<string | null>(null);
   const [currentPage, setCurrentPage] = useState(1);
@@ -64,36 +66,50 @@ const AdminDashboard: React.FC = () => {
     fetchRole();
   }, [backendUrl, router]);
 
-  // Fetch API logs
-  useEffect(() => {
+  // Fetch one page of API logs (newest first); a cursor appends the next page to those already loaded
+  const fetchApiLogs = useCallback(async (cursor: string | null) => {
     const token = localStorage.getItem('token');
-    if (!token || role !== 'admin') return;
+    if (!token) return;
 
-    const fetchApiLogs = async () => {
-      try {
-        const response = await axios.get(`${backendUrl}/admin/api-logs/`, {
-          headers: { Authorization: `Token ${token}` },
-        });
-        setApiLogs(response.data);
-      } catch (error) {
-        setError("Failed to fetch API logs");
-        console.error("Error fetching API logs:", error);
-      }
-    };
+    setLoadingLogs(true);
+    try {
+      const response = await axios.get(`${backendUrl}/admin/api-logs/`, {
+        headers: { Authorization: `Token ${token}` },
+        params: cursor ? { cursor } : {},
+      });
+      setApiLogs((prev) => (cursor ? [...prev, ...response.data.results] : response.data.results));
+      setLogsCursor(response.data.next_cursor);
+    } catch (error) {
+      setError("Failed to fetch API logs");
+      console.error("Error fetching API logs:", error);
+    } finally {
+      setLoadingLogs(false);
+    }
+  }, [backendUrl]);
 
-    fetchApiLogs();
-  }, [backendUrl, role]);
+  useEffect(() => {
+    if (role === 'admin') {
+      fetchApiLogs(null);
+    }
+  }, [fetchApiLogs, role]);
 
-  // Fetch all users
+  // Fetch all users, following next_cursor through every page for the preference charts
   useEffect(() => {
     const token = localStorage.getItem('token');
     if (role === 'admin' && token) {
       const fetchUsers = async () => {
         try {
-          const response = await axios.get(`${backendUrl}/admin/users/`, {
-            headers: { Authorization: `Token ${token}` },
-          });
-          setUsers(response.data);
+          const allUsers: any[] = [];
+          let cursor: string | null = null;
+          do {
+            const response: any = await axios.get(`${backendUrl}/admin/users/`, {
+              headers: { Authorization: `Token ${token}` },
+              params: cursor ? { cursor } : {},
+            });
+            allUsers.push(...response.data.results);
+            cursor = response.data.next_cursor;
+          } while (cursor);
+          setUsers(allUsers);
         } catch (error) {
           setError("Failed to fetch users");
           console.error("Error fetching users:", error);
@@ -237,6 +253,17 @@ const AdminDashboard: React.FC = () => {
               Next
             </button>
           </div>
+          {logsCursor && (
+            <div className="flex justify-center mt-4">
+              <button
+                onClick={() => fetchApiLogs(logsCursor)}
+                disabled={loadingLogs}
+                className="py-2 px-4 bg-gray-700 rounded-lg hover:bg-gray-600 transition duration-300 disabled:opacity-50"
+              >
+                {loadingLogs ? 'Loading...' : 'Load older logs'}
+              </button>
+            </div>
+          )}
         </div>
 
         {/* Visualization Section */}
@@ -133,7 +133,18 @@ const DashboardPage: React.FC = () => {
   };
 
   // Handle logout
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    const token = localStorage.getItem('token');
+    if (token) {
+      try {
+        // Revoke the token server-side so it cannot be reused
+        await axios.post(`${backendUrl}/logout/`, null, {
+          headers: { Authorization: `Token ${token}` },
+        });
+      } catch (error) {
+        console.error("Failed to revoke token", error);
+      }
+    }
     localStorage.removeItem('token');
     router.push('/login');
   };